@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+
+# On disk cache of pair results for GeneSequencing.align()
+
+import hashlib
+import json
+import math
+import sqlite3
+import time
+
+from GeneSequencing import MATCH, INDEL, SUB, MAXINDELS, SEED_CHAIN_WINDOW, SEED_KMER, \
+    SEED_MAX_HITS
+
+
+'''
+    Content addressed store of (score, first 100 characters of both alignments, details)
+    in a SQLite file, details being what the strategy adds to a result (the adaptive
+    bandwidth, the seeded anchors). The key hashes the two sequence prefixes that are
+    actually aligned together with the scoring constants, MAXINDELS, the strategy and
+    align_length (and the seed constants for the seeded strategy), so a change to any of
+    them is a miss rather than a stale hit. Once there are more than maxEntries results
+    the least recently used ones are dropped. hits and misses count the lookups since the
+    cache was opened.
+'''
+
+
+class AlignmentCache:
+
+    def __init__(self, filename='alignment_cache.sqlite', maxEntries=100000):
+        self.filename = filename
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        # the GUI opens the cache on the main thread and aligns on a worker thread, only
+        # one of them uses it at a time
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, score REAL, '
+            'seqi TEXT, seqj TEXT, last_used REAL, details TEXT)')
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(results)')]
+        if 'details' not in columns:
+            # a file from before the details were kept, its results have none
+            self.connection.execute('ALTER TABLE results ADD COLUMN details TEXT')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def key(self, seqI, seqJ, strategy, align_length):
+        # hirschberg returns exactly what unrestricted does
+        if strategy == 'hirschberg':
+            strategy = 'unrestricted'
+        parts = [hashlib.sha1(seqI[:align_length].encode('latin-1')).hexdigest(),
+                 hashlib.sha1(seqJ[:align_length].encode('latin-1')).hexdigest(),
+                 MATCH, INDEL, SUB, MAXINDELS, strategy, align_length]
+        if strategy == 'seeded':
+            parts += [SEED_KMER, SEED_MAX_HITS, SEED_CHAIN_WINDOW]
+        return hashlib.sha256(' '.join(str(part) for part in parts).encode()).hexdigest()
+
+    '''
+        Returns (score, alignment1, alignment2, details) or None on a miss. Entries stored by a
+        score only run have None alignments and count as a miss when needAlignment.
+    '''
+
+    def get(self, seqI, seqJ, strategy, align_length, needAlignment=True):
+        key = self.key(seqI, seqJ, strategy, align_length)
+        row = self.connection.execute(
+            'SELECT score, seqi, seqj, details FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None or (needAlignment and row[1] is None):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute(
+            'UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        score, alignment1, alignment2, details = row
+        return ((int(score) if score != math.inf else math.inf), alignment1, alignment2,
+                json.loads(details) if details else {})
+
+    def put(self, seqI, seqJ, strategy, align_length, score, alignment1, alignment2,
+            details=None):
+        key = self.key(seqI, seqJ, strategy, align_length)
+        details = json.dumps(details or {})
+        if alignment1 is None:
+            # don't let a score only run throw away alignments already stored
+            self.connection.execute(
+                'INSERT OR IGNORE INTO results (key, score, seqi, seqj, last_used, details) '
+                'VALUES (?, ?, NULL, NULL, ?, ?)', (key, score, time.time(), details))
+        else:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO results (key, score, seqi, seqj, last_used, details) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, score, alignment1[:100], alignment2[:100], time.time(), details))
+
+    '''
+        Writes the pending changes and evicts the least recently used results that
+        don't fit in maxEntries
+    '''
+
+    def commit(self):
+        extra = self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0] \
+            - self.maxEntries
+        if extra > 0:
+            self.connection.execute(
+                'DELETE FROM results WHERE key IN '
+                '(SELECT key FROM results ORDER BY last_used LIMIT ?)', (extra,))
+        self.connection.commit()
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self):
+        return 'cache: {} hits, {} misses ({:.0%} hit rate)'.format(
+            self.hits, self.misses, self.hitRate())
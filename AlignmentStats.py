@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+
+# Timing and counts of a GeneSequencing.align() run, off unless a stats object is passed
+#
+#   stats = AlignmentStats(trace=True)
+#   GeneSequencing().align(sequences, None, True, 3000, stats=stats)
+#   print(stats.summary())
+#   stats.writeChromeTrace('align.json')      # open in chrome://tracing or Perfetto
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Order the phases are listed in by summary()
+PHASES = ('load', 'prefilter', 'compute', 'traceback', 'cache', 'table', 'progress')
+
+
+'''
+    Collects spans (name, start, end) from perf_counter timestamps. align() reports
+    'compute' for the work on each pair (which includes 'traceback', the walk back
+    through the pointers, and 'prefilter', the threshold check, of the serial path),
+    'cache' for cache lookups and writes, 'table' for the GUI table updates and
+    'progress' for the progress callback. Callers add their own, 'load' for reading the
+    sequences. Each span is added to its phase total, passed to callback(name, start,
+    end, args) if there is one and, with trace, kept as a Chrome trace event. With
+    traceMemory align() also runs tracemalloc for the peak Python memory, which slows it
+    down.
+'''
+
+
+class AlignmentStats:
+
+    def __init__(self, trace=False, callback=None, traceMemory=False):
+        self.callback = callback
+        self.traceMemory = traceMemory
+        self.events = [] if trace else None
+        self.origin = time.perf_counter()
+        self.seconds = {}
+        self.counts = {}
+        self.pairs = []
+        self.cells = 0
+        self.outOfBand = 0
+        self.peakBytes = None
+        self.startedTracing = False
+        self.runs = 0
+        self.runSeconds = 0.0
+
+    def span(self, name, start, end, **args):
+        self.seconds[name] = self.seconds.get(name, 0.0) + end - start
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self.callback is not None:
+            self.callback(name, start, end, args)
+        if self.events is not None:
+            # spans run by a pool worker are given its pid and get a row of their own
+            pid = args.pop('pid', None)
+            tid = pid if pid is not None else threading.get_ident()
+            self.events.append({'name': name, 'ph': 'X', 'pid': pid or os.getpid(), 'tid': tid,
+                                'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+                                'args': args})
+
+    '''
+        Wraps function so every call is a span called name
+    '''
+
+    def timed(self, name, function):
+        def timedFunction(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.span(name, start, time.perf_counter())
+        return timedFunction
+
+    '''
+        One aligned pair: its compute span and what it cost. cells is the estimate of
+        GeneSequencing.pairCells and an infinite score (no alignment in the band) is
+        counted as out of band.
+    '''
+
+    def pair(self, i, j, start, end, cells, score, **args):
+        self.pairs.append((i, j, end - start, cells))
+        self.cells += cells
+        if score == float('inf'):
+            self.outOfBand += 1
+        self.span('compute', start, end, i=i, j=j, cells=cells, **args)
+
+    '''
+        Pairs aligned together between start and end, (i, j, cells, score) each. They are
+        one compute span and each pair is given an equal share of its time.
+    '''
+
+    def batch(self, start, end, pairs):
+        share = (end - start) / max(len(pairs), 1)
+        for i, j, cells, score in pairs:
+            self.pairs.append((i, j, share, cells))
+            self.cells += cells
+            if score == float('inf'):
+                self.outOfBand += 1
+        self.span('compute', start, end, pairs=len(pairs),
+                  cells=sum(pair[2] for pair in pairs))
+
+    def begin(self):
+        self.runStart = time.perf_counter()
+        if self.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.startedTracing = True
+
+    def end(self):
+        end = time.perf_counter()
+        self.runs += 1
+        self.runSeconds += end - self.runStart
+        self.span('align', self.runStart, end)
+        if tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peakBytes = max(self.peakBytes or 0, peak)
+            if self.startedTracing:
+                tracemalloc.stop()
+                self.startedTracing = False
+
+    def summary(self):
+        computeSeconds = self.seconds.get('compute', 0.0)
+        lines = ['{} pairs in {:.3f} s, {} cells, {:.2f} Mcells/s, {} out of band (inf)'.format(
+            len(self.pairs), self.runSeconds, self.cells,
+            self.cells / computeSeconds / 1e6 if computeSeconds > 0 else 0, self.outOfBand)]
+        for name in PHASES + tuple(sorted(set(self.seconds) - set(PHASES) - {'align'})):
+            if name in self.seconds:
+                lines.append('  {:<10} {:>10.3f} s {:>8} calls'.format(
+                    name, self.seconds[name], self.counts[name]))
+        if self.pairs:
+            slowest = max(self.pairs, key=lambda pair: pair[2])
+            lines.append('  slowest pair {},{} {:.3f} s'.format(*slowest[:3]))
+        if self.peakBytes is not None:
+            lines.append('  peak traced memory {:.1f} MB'.format(self.peakBytes / 1e6))
+        if resource is not None:
+            # kilobytes on Linux
+            lines.append('  max resident {:.1f} MB'.format(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3))
+        return '\n'.join(lines)
+
+    def writeChromeTrace(self, filename):
+        with open(filename, 'w') as out:
+            json.dump({'traceEvents': self.events or [], 'displayTimeUnit': 'ms'}, out)
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+
+# Checkpoints of the DP frontier of aligned pairs, so running GeneSequencing.align()
+# again at a longer align_length only fills the new cells
+
+import hashlib
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict
+
+from GeneSequencing import MATCH, INDEL, SUB, MAXINDELS
+
+# Default memory budget of the checkpoints kept in a CheckpointStore
+CHECKPOINT_BYTES = 256 << 20
+
+
+'''
+    Holds the Checkpoint of each (pair, strategy, align_length) aligned with it, the
+    least recently used ones are dropped once they take more than maxBytes. Given a
+    filename they are also written to a SQLite file (pickled, so only open files you
+    wrote yourself) and found there when they are no longer in memory, the file keeps
+    at most maxEntries of them. A lookup finds the checkpoint of the longest
+    align_length up to the one asked for whose prefixes of the pair are the same.
+'''
+
+
+class CheckpointStore:
+
+    def __init__(self, maxBytes=CHECKPOINT_BYTES, filename=None, maxEntries=10000):
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lengths = set()
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        if filename is not None:
+            self.connection = sqlite3.connect(filename, check_same_thread=False)
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS checkpoints (key TEXT PRIMARY KEY, '
+                'align_length INTEGER, data BLOB, last_used REAL)')
+            self.lengths.update(length for length, in self.connection.execute(
+                'SELECT DISTINCT align_length FROM checkpoints'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.commit()
+            self.connection.close()
+            self.connection = None
+
+    def key(self, horizontalSeq, verticalSeq, strategy, align_length):
+        parts = [hashlib.sha1(horizontalSeq[:align_length].encode('latin-1')).hexdigest(),
+                 hashlib.sha1(verticalSeq[:align_length].encode('latin-1')).hexdigest(),
+                 MATCH, INDEL, SUB, MAXINDELS, strategy, align_length]
+        return hashlib.sha256(' '.join(str(part) for part in parts).encode()).hexdigest()
+
+    '''
+        The checkpoint to extend for aligning the pair at align_length, None if there is
+        none. needDirections skips checkpoints of score only runs.
+        Time:
+            O(la) for l stored align_lengths up to align_length, to hash the prefixes
+        Space:
+            O(1) besides the checkpoint
+    '''
+
+    def get(self, horizontalSeq, verticalSeq, strategy, align_length, needDirections=True):
+        for length in sorted(self.lengths, reverse=True):
+            if length > align_length:
+                continue
+            key = self.key(horizontalSeq, verticalSeq, strategy, length)
+            checkpoint = self.entries.get(key)
+            if checkpoint is not None:
+                self.entries.move_to_end(key)
+            else:
+                checkpoint = self.load(key)
+            if checkpoint is not None and (checkpoint.directions is not None or not needDirections):
+                self.hits += 1
+                return checkpoint
+        self.misses += 1
+        return None
+
+    def put(self, horizontalSeq, verticalSeq, strategy, align_length, checkpoint):
+        key = self.key(horizontalSeq, verticalSeq, strategy, align_length)
+        self.lengths.add(align_length)
+        self.remember(key, checkpoint)
+        if self.connection is not None:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)',
+                (key, align_length, pickle.dumps(checkpoint), time.time()))
+
+    def remember(self, key, checkpoint):
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key).size()
+        self.entries[key] = checkpoint
+        self.bytes += checkpoint.size()
+        while self.bytes > self.maxBytes and self.entries:
+            self.bytes -= self.entries.popitem(last=False)[1].size()
+
+    def load(self, key):
+        if self.connection is None:
+            return None
+        row = self.connection.execute(
+            'SELECT data FROM checkpoints WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            'UPDATE checkpoints SET last_used = ? WHERE key = ?', (time.time(), key))
+        checkpoint = pickle.loads(row[0])
+        self.remember(key, checkpoint)
+        return checkpoint
+
+    '''
+        Writes the pending checkpoints to the file and drops the least recently used
+        ones past maxEntries
+    '''
+
+    def commit(self):
+        if self.connection is None:
+            return
+        extra = self.connection.execute('SELECT COUNT(*) FROM checkpoints').fetchone()[0] \
+            - self.maxEntries
+        if extra > 0:
+            self.connection.execute(
+                'DELETE FROM checkpoints WHERE key IN '
+                '(SELECT key FROM checkpoints ORDER BY last_used LIMIT ?)', (extra,))
+        self.connection.commit()
+
+    def summary(self):
+        return 'checkpoints: {} extended, {} from scratch, {:.1f} MB in memory'.format(
+            self.hits, self.misses, self.bytes / 1e6)
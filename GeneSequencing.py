@@ -4,7 +4,18 @@
 
 
 import math
+import os
 import time
+from operator import add
+from collections import OrderedDict
+from functools import partial
+from heapq import heappop, heappush
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Used to compute the bandwidth for banded version
 MAXINDELS = 3
@@ -14,6 +25,299 @@ MATCH = -3
 INDEL = 5
 SUB = 1
 
+# Traceback pointers stored in fromArray, two bits each (see DirectionTable).
+# Cells that are never filled and the start cell are both 0, the traceback
+# tells them apart by where it is when it reads a 0.
+FROM_NONE = 0
+FROM_START = 0
+FROM_LEFT = 1
+FROM_ABOVE = 2
+FROM_DIAGONAL = 3
+
+# Engines that can be passed to align(), 'batch' is numpy with the banded pairs of
+# align() run together by bandedAlignmentBatch
+ENGINES = ('python', 'numpy', 'batch')
+
+# Most pairs bandedAlignmentBatch runs side by side, bounds the memory of its tables
+BATCH_LANES = 1024
+
+# Pairs align(workers=...) orders longest first at a time, per pair it keeps on the pool
+POOL_ORDER_WINDOW = 4
+
+# Strategies that can be passed to align(), None picks banded or unrestricted
+STRATEGIES = ('unrestricted', 'banded', 'hirschberg', 'adaptive', 'seeded')
+
+# Length of the exact k-mer seeds of seededAlignment
+SEED_KMER = 12
+
+# k-mers found more often than this in the horizontal sequence are repeats, too
+# ambiguous to seed with
+SEED_MAX_HITS = 8
+
+# Number of anchors before each one that chainAnchors considers following
+SEED_CHAIN_WINDOW = 256
+
+# Regions of at most this many cells are solved directly by hirschbergAlignment
+HIRSCHBERG_BASE_CELLS = 1 << 16
+
+# Default memory budget of the tracebacks kept by a TracebackStore
+TRACEBACK_BYTES = 64 << 20
+
+# Rows between two checks of the cutoff of the cell by cell alignments, each check is
+# about as much work as a band row
+CUTOFF_ROWS = 8
+
+# Methods GeneSequencing.instrument() times, and the AlignmentStats phase of each
+INSTRUMENTED = {'generateAlignment': 'traceback', 'generateBandedAlignment': 'traceback',
+                'generateAffineAlignment': 'traceback', 'bandedBatchTraceback': 'traceback',
+                'prefilterPair': 'prefilter'}
+
+
+'''
+    One entry of the results of align(scoreOnly=True), or of align with tracebacks. It
+    holds align_cost from the start and builds the alignment strings of the pair the
+    first time seqi_first100 or seqj_first100 is read, so only the pairs someone looks
+    at pay for them. With a Traceback that is only the walk through its pointers,
+    without one (score only, or the TracebackStore dropped it) the pair is aligned again.
+'''
+
+
+class LazyAlignment(dict):
+
+    def __init__(self, score, alignPair, *pairArgs, traceback=None, tracebacks=None):
+        super().__init__(align_cost=score)
+        self.alignPair = alignPair
+        self.pairArgs = pairArgs
+        self.traceback = None
+        self.tracebacks = tracebacks
+        if traceback is not None:
+            tracebacks.keep(self, traceback)
+
+    def __missing__(self, key):
+        if key not in ('seqi_first100', 'seqj_first100'):
+            raise KeyError(key)
+        if self.traceback is not None:
+            alignment1, alignment2 = self.traceback.alignments()
+            self.tracebacks.release(self)
+        else:
+            _, alignment1, alignment2 = self.alignPair(*self.pairArgs)
+        self['seqi_first100'] = alignment1[:100]
+        self['seqj_first100'] = alignment2[:100]
+        return self[key]
+
+
+'''
+    The pointers of one aligned pair and the function that walks them, so the alignment
+    strings can be built later. generate(*args) returns the alignments of the horizontal
+    and vertical sequence, flipped swaps them back for pairs aligned the other way round.
+'''
+
+
+class Traceback:
+
+    def __init__(self, directions, generate, *args):
+        self.directions = directions
+        self.generate = generate
+        self.args = args
+        self.flipped = False
+
+    def alignments(self):
+        alignment1, alignment2 = self.generate(*self.args)
+        if self.flipped:
+            return alignment2, alignment1
+        return alignment1, alignment2
+
+    def size(self):
+        return 0 if self.directions is None else self.directions.size()
+
+
+'''
+    Gives LazyAlignment records their Traceback while the tracebacks take at most
+    maxBytes. Past that the ones kept longest ago are dropped and those records fall
+    back to aligning their pair again when they are read.
+'''
+
+
+class TracebackStore:
+
+    def __init__(self, maxBytes=TRACEBACK_BYTES):
+        self.maxBytes = maxBytes
+        self.records = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    def keep(self, record, traceback):
+        record.traceback = traceback
+        self.records[id(record)] = record
+        self.bytes += traceback.size()
+        while self.bytes > self.maxBytes and self.records:
+            self.release(next(iter(self.records.values())))
+            self.evictions += 1
+
+    def release(self, record):
+        if self.records.pop(id(record), None) is not None:
+            self.bytes -= record.traceback.size()
+        record.traceback = None
+
+    def clear(self):
+        for record in list(self.records.values()):
+            self.release(record)
+
+
+'''
+    Traceback pointers of a rows x cols DP table packed four to a byte, so a cell
+    costs 2 bits instead of a Python object reference. Rows are written whole,
+    either from a list of pointers (setRow) or from a numpy array of pointers
+    (fromCodes), and read back one cell at a time by the traceback.
+'''
+
+
+class DirectionTable:
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.rowBytes = (cols + 3) // 4
+        self.data = bytearray(rows * self.rowBytes)
+
+    @classmethod
+    def fromCodes(cls, codes):
+        rows, cols = codes.shape
+        table = cls(rows, cols)
+        padded = np.zeros((rows, table.rowBytes * 4), dtype=np.uint8)
+        padded[:, :cols] = codes
+        quads = padded.reshape(rows, table.rowBytes, 4)
+        table.data[:] = (quads[:, :, 0] | (quads[:, :, 1] << 2) |
+                         (quads[:, :, 2] << 4) | (quads[:, :, 3] << 6)).tobytes()
+        return table
+
+    def setRow(self, i, codes):
+        codes = codes + [FROM_NONE] * (self.rowBytes * 4 - len(codes))
+        start = i * self.rowBytes
+        self.data[start:start + self.rowBytes] = bytes(
+            a | (b << 2) | (c << 4) | (d << 6)
+            for a, b, c, d in zip(codes[0::4], codes[1::4], codes[2::4], codes[3::4]))
+
+    def get(self, i, j):
+        return (self.data[i * self.rowBytes + (j >> 2)] >> ((j & 3) << 1)) & 3
+
+    def size(self):
+        return len(self.data)
+
+
+'''
+    The pointers of an unrestricted table that was extended from a smaller one: the
+    old rows x cols block (itself a DirectionTable or another StitchedDirections), the
+    strip to its right (rows 1..oldRows-1) and the strip below it (all columns from 1).
+    Row 0 and column 0 outside the old block come from the left and from above.
+    Reads the same as one DirectionTable of the whole extended table.
+'''
+
+
+class StitchedDirections:
+
+    def __init__(self, old, right, bottom, rows, cols):
+        self.old = old
+        self.right = right
+        self.bottom = bottom
+        self.rows = rows
+        self.cols = cols
+
+    def get(self, i, j):
+        if i < self.old.rows and j < self.old.cols:
+            return self.old.get(i, j)
+        if i == 0:
+            return FROM_LEFT
+        if j == 0:
+            return FROM_ABOVE
+        if i < self.old.rows:
+            return self.right.get(i - 1, j - self.old.cols)
+        return self.bottom.get(i - self.old.rows, j - 1)
+
+    def size(self):
+        return self.old.size() + self.right.size() + self.bottom.size()
+
+
+'''
+    The band pointers of a banded table that was extended from a checkpoint: rows
+    below split come from old and the rest from new. rows can be less than old and
+    new hold between them, a checkpoint only keeps the rows that won't change.
+'''
+
+
+class BandDirections:
+
+    def __init__(self, old, new, split, rows):
+        self.old = old
+        self.new = new
+        self.split = split
+        self.rows = rows
+        self.cols = new.cols
+
+    def get(self, i, j):
+        if i < self.split:
+            return self.old.get(i, j)
+        return self.new.get(i - self.split, j)
+
+    def size(self):
+        return (self.old.size() if self.old is not None else 0) + self.new.size()
+
+
+'''
+    The DP frontier of a finished alignment, enough to carry on to a longer align_length
+    without redoing the cells that don't change. For unrestricted n and m are the prefix
+    lengths, row is the last row (n) of the cost table and column its last column (m).
+    For banded n is the last band row whose cells are all the same at any longer
+    align_length, row holds its costs and m and column are None. directions are the
+    pointers up to the frontier, None when only the score was computed.
+'''
+
+
+class Checkpoint:
+
+    def __init__(self, n, m, row, column, directions=None):
+        self.n = n
+        self.m = m
+        self.row = row
+        self.column = column
+        self.directions = directions
+
+    def size(self):
+        cells = len(self.row) + (len(self.column) if self.column is not None else 0)
+        return 8 * cells + (self.directions.size() if self.directions is not None else 0)
+
+
+'''
+    Costs for the affine gap alignments. A gap of length L costs gapOpen + (L-1)*gapExtend,
+    so with gapOpen == gapExtend == INDEL (the defaults) the costs are the linear ones of
+    MATCH, INDEL and SUB. gapOpen can't be below gapExtend.
+'''
+
+
+class Scoring:
+
+    def __init__(self, match=MATCH, sub=SUB, gapOpen=INDEL, gapExtend=INDEL):
+        if gapOpen < gapExtend:
+            raise ValueError("gapOpen ({}) must be at least gapExtend ({})".format(
+                gapOpen, gapExtend))
+        self.match = match
+        self.sub = sub
+        self.gapOpen = gapOpen
+        self.gapExtend = gapExtend
+
+    def __repr__(self):
+        return 'Scoring(match={}, sub={}, gapOpen={}, gapExtend={})'.format(
+            self.match, self.sub, self.gapOpen, self.gapExtend)
+
+    def __eq__(self, other):
+        return isinstance(other, Scoring) and repr(self) == repr(other)
+
+    def __hash__(self):
+        return hash(repr(self))
+
+    def gapCost(self, length):
+        return self.gapOpen + (length - 1) * self.gapExtend if length > 0 else 0
+
 
 class GeneSequencing:
 
@@ -67,29 +371,31 @@ class GeneSequencing:
             O(a) where a is the align_length in most cases
     '''
 
-    def generateBandedAlignment(self, horizontalSeq, verticalSeq, fromArray, align_length, retJ):
+    def generateBandedAlignment(self, horizontalSeq, verticalSeq, fromArray, align_length, retJ,
+                                maxIndels=MAXINDELS):
         horizontalAlignment = []
         verticalAlignment = []
-        v = len(fromArray) - 1
-        h = retJ - 1  # 7 in our case
-        while fromArray[v][h] != "START":
-            adjustH = v + h - MAXINDELS
-            if fromArray[v][h] == "LEFT":
+        v = fromArray.rows - 1
+        h = retJ - 1  # the end cell's column in the band
+        direction = fromArray.get(v, h)
+        while direction != FROM_START:
+            adjustH = v + h - maxIndels
+            if direction == FROM_LEFT:
                 verticalAlignment.append("-")
                 horizontalAlignment.append(horizontalSeq[adjustH-1])
                 h -= 1
-            elif fromArray[v][h] == "ABOVE":
+            elif direction == FROM_ABOVE:
                 verticalAlignment.append(verticalSeq[v-1])
                 horizontalAlignment.append("-")
                 v -= 1
                 h += 1
-            elif fromArray[v][h] == "DIAGONAL":
+            else:
                 verticalAlignment.append(verticalSeq[v-1])
                 v -= 1
                 horizontalAlignment.append(horizontalSeq[adjustH - 1])
-            else:
-                print(fromArray[v][h])
-                raise ValueError("UNKNOWN VALUE")
+            direction = fromArray.get(v, h)
+        if v != 0 or h != maxIndels:
+            raise ValueError("UNKNOWN VALUE")
         return "".join(horizontalAlignment[::-1]), "".join(verticalAlignment[::-1])
     '''
         Generates the Alignment String
@@ -108,25 +414,26 @@ class GeneSequencing:
     def generateAlignment(self, horizontalSeq, verticalSeq, fromArray, align_length):
         horizontalAlignment = []
         verticalAlignment = []
-        v = len(fromArray) - 1
-        h = len(fromArray[0]) - 1
-        while fromArray[v][h] != "START":
-            if fromArray[v][h] == "LEFT":
+        v = fromArray.rows - 1
+        h = fromArray.cols - 1
+        direction = fromArray.get(v, h)
+        while direction != FROM_START:
+            if direction == FROM_LEFT:
                 verticalAlignment.append("-")
                 horizontalAlignment.append(horizontalSeq[h-1])
                 h -= 1
-            elif fromArray[v][h] == "ABOVE":
+            elif direction == FROM_ABOVE:
                 verticalAlignment.append(verticalSeq[v-1])
                 horizontalAlignment.append("-")
                 v -= 1
-            elif fromArray[v][h] == "DIAGONAL":
+            else:
                 verticalAlignment.append(verticalSeq[v-1])
                 v -= 1
                 horizontalAlignment.append(horizontalSeq[h-1])
                 h -= 1
-            else:
-                print(fromArray[v][h])
-                raise ValueError("UNKNOWN VALUE")
+            direction = fromArray.get(v, h)
+        if v != 0 or h != 0:
+            raise ValueError("UNKNOWN VALUE")
         return "".join(horizontalAlignment[::-1]), "".join(verticalAlignment[::-1])
     '''
         Generates the Alignment String
@@ -139,60 +446,95 @@ class GeneSequencing:
             In most cases the align_length < the length of the strings so in most cases it 
             would be O(ka) where a is the align_length
         Space:
-            O(kn) the two arrays used for storage are cols = k and rows = n 
-            and so the storage needed is 2*k*n (2 arrays)
+            O(kn) fromArray is a DirectionTable of k*n cells at 2 bits each and
+            only two band rows of costs are kept
             In most cases the align_length < the length of the strings so in most cases it 
             would be O(ka) where a is the align_length
+        With cutoff it stops at the first row that proves the cost is above cutoff (see
+        remainingCost) and returns that lower bound, None, None.
     '''
 
-    def bandedAlignment(self, horizontalSeq, verticalSeq, align_length):
+    def bandedAlignment(self, horizontalSeq, verticalSeq, align_length, maxIndels=MAXINDELS,
+                        cutoff=None):
         maxJ = min(align_length, len(horizontalSeq))
         cols = min((align_length + 1), len(horizontalSeq) + 1)
         # n is legnth of smaller string which is always the 2nd argument
         rows = min((align_length + 1), len(verticalSeq) + 1)
-        if cols - rows > MAXINDELS:
+        if abs(cols - rows) > maxIndels:
             return float('inf'), "No Alignment Possible", "No Alignment Possible"
-        cols = 2*MAXINDELS + 1  # 2*MAXINDELS + 1 == k
-        cost = [[float('inf')]*(cols) for _ in range(rows)]
-        fromArray = [["NONE"]*(cols) for _ in range(rows)]
-        cost[0][MAXINDELS] = 0
-        fromArray[0][MAXINDELS] = "START"
-        retJ = 0
-        for i in range(rows):
+        # band column of the end cell (rows - 1, cols - 1), plus one
+        retJ = cols - rows + maxIndels + 1
+        cols = 2*maxIndels + 1  # 2*maxIndels + 1 == k
+        horizontal = horizontalSeq[:maxJ].encode('latin-1')
+        vertical = verticalSeq[:rows - 1].encode('latin-1')
+        fromArray = DirectionTable(rows, cols)
+        # one inf cell on the right so above is always a valid index
+        cost = [float('inf')] * (cols + 1)
+        cost[maxIndels] = 0
+        cost, bound = self.fillBandRows(horizontal, vertical, maxJ, 0, rows, cost, fromArray,
+                                        maxIndels, cutoff=cutoff)
+        if cost is None:
+            return bound, None, None
+        alignment1, alignment2 = self.generateBandedAlignment(
+            horizontalSeq, verticalSeq, fromArray, align_length, retJ, maxIndels)
+        return cost[retJ - 1], alignment1, alignment2
+    '''
+        Fills band rows startRow..rows-1 of bandedAlignment given the costs of the row
+        before (or of row 0 before it is filled, when startRow is 0). Row i's pointers go
+        in row i - startRow of fromArray unless it is None. Returns the last row's costs
+        and the costs of row keepRow if it was filled. With cutoff it returns None and the
+        lower bound instead as soon as a row shows the end cell costs more than cutoff.
+        Time:
+            O(k(rows - startRow))
+        Space:
+            O(k) besides fromArray
+    '''
+
+    def fillBandRows(self, horizontal, vertical, maxJ, startRow, rows, cost, fromArray, maxIndels,
+                     keepRow=None, cutoff=None):
+        cols = 2*maxIndels + 1
+        kept = None
+        if cutoff is not None:
+            # the columns left minus the rows left is the same all along a band column
+            remaining = [self.remainingCost(maxJ + maxIndels - j - rows + 1)
+                         for j in range(cols + 1)]
+        for i in range(startRow, rows):
+            prev = cost
+            cost = [float('inf')] * (cols + 1) if i > 0 else prev
+            directions = [FROM_NONE] * cols
             for j in range(cols):
-                if i == 0 and j <= MAXINDELS:
+                if i == 0 and j <= maxIndels:
                     continue
-                adjustJ = j + i - MAXINDELS
+                adjustJ = j + i - maxIndels
                 if adjustJ > maxJ or adjustJ < 0:
                     continue
-                if i == rows - 1:
-                    retJ += 1
-                # print(jEnd, adjustJ, i, j, len(horizontalSeq))
-                if horizontalSeq[adjustJ - 1] == verticalSeq[i-1]:
-                    diagonalCost = (
-                        cost[i - 1][j] + MATCH) if self.checkBoundaries(i - 1, j, rows, cols) else float('inf')
+                leftCost = cost[j - 1] + INDEL if j > 0 else float('inf')
+                if i > 0:
+                    # column 0 has no diagonal, and horizontal may be empty
+                    diagonalCost = prev[j] + (
+                        MATCH if horizontal[adjustJ - 1] == vertical[i - 1] else SUB) \
+                        if adjustJ > 0 else float('inf')
+                    aboveCost = prev[j + 1] + INDEL
                 else:
-                    diagonalCost = (
-                        cost[i-1][j] + SUB) if self.checkBoundaries(i-1, j, rows, cols) else float('inf')
-                aboveCost = (
-                    cost[i-1][j + 1] + INDEL) if self.checkBoundaries(i-1, j + 1, rows, cols) else float('inf')
-                leftCost = (
-                    cost[i][j - 1] + INDEL) if self.checkBoundaries(i, j - 1, rows, cols) else float('inf')
-                minCost = self.findMin(
-                    leftCost, aboveCost, diagonalCost)
-                if minCost == "left":
-                    cost[i][j] = leftCost
-                    fromArray[i][j] = "LEFT"
-                elif minCost == "above":
-                    cost[i][j] = aboveCost
-                    fromArray[i][j] = "ABOVE"
-                elif minCost == "diagonal":
-                    cost[i][j] = diagonalCost
-                    fromArray[i][j] = "DIAGONAL"
-        assert(cost[0][MAXINDELS] == 0)
-        alignment1, alignment2 = self.generateBandedAlignment(
-            horizontalSeq, verticalSeq, fromArray, align_length, retJ)
-        return cost[rows-1][retJ - 1], alignment1, alignment2
+                    diagonalCost = aboveCost = float('inf')
+                if diagonalCost <= leftCost and diagonalCost <= aboveCost:
+                    cost[j] = diagonalCost
+                    directions[j] = FROM_DIAGONAL
+                elif aboveCost <= leftCost:
+                    cost[j] = aboveCost
+                    directions[j] = FROM_ABOVE
+                else:
+                    cost[j] = leftCost
+                    directions[j] = FROM_LEFT
+            if fromArray is not None:
+                fromArray.setRow(i - startRow, directions)
+            if i == keepRow:
+                kept = cost
+            if cutoff is not None and (i % CUTOFF_ROWS == 0 or i == rows - 1):
+                bound = min(map(add, cost, remaining)) + MATCH * (rows - 1 - i)
+                if bound > cutoff:
+                    return None, bound
+        return cost, kept
     '''
         Generates the Alignment String
         n and m are the lengths of the strings
@@ -202,54 +544,1490 @@ class GeneSequencing:
             In most cases the align_length < the length of the strings so in most cases it 
             would be O(a^2) where a is the align_length
         Space:
-            O(nm) the two arrays used for storage are cols = m and rows = n 
-            and so the storage needed is 2*m*n (2 arrays)
+            O(nm) fromArray is a DirectionTable of m*n cells at 2 bits each and
+            only two rows of costs are kept
             In most cases the align_length < the length of the strings so in most cases it 
             would be O(a^2) where a is the align_length
+        With cutoff it stops at the first row that proves the cost is above cutoff (see
+        remainingCost) and returns that lower bound, None, None.
     '''
 
-    def unrestrictedAlignment(self, horizontalSeq, verticalSeq, align_length):
+    def unrestrictedAlignment(self, horizontalSeq, verticalSeq, align_length, cutoff=None):
         cols = min((align_length + 1), len(horizontalSeq) + 1)  # m
         rows = min((align_length + 1), len(verticalSeq) + 1)  # n
-        cost = [[float('inf')]*cols for _ in range(rows)]
-        fromArray = [["NONE"]*cols for _ in range(rows)]
-        cost[0][0] = 0
-        fromArray[0][0] = "START"
-        for i in range(rows):
-            for j in range(cols):
-                # left
-                if i != 0 or j != 0:
-                    if horizontalSeq[j-1] == verticalSeq[i-1]:
-                        diagonalCost = (
-                            cost[i - 1][j - 1] + MATCH) if self.checkBoundaries(i - 1, j - 1, rows, cols) else float('inf')
-                    else:
-                        diagonalCost = (
-                            cost[i-1][j-1] + SUB) if self.checkBoundaries(i-1, j-1, rows, cols) else float('inf')
-                    aboveCost = (
-                        cost[i-1][j] + INDEL) if self.checkBoundaries(i-1, j, rows, cols) else float('inf')
-                    leftCost = (
-                        cost[i][j-1] + INDEL) if self.checkBoundaries(i, j-1, rows, cols) else float('inf')
-                    minCost = self.findMin(leftCost, aboveCost, diagonalCost)
-                    if minCost == "left":
-                        cost[i][j] = leftCost
-                        fromArray[i][j] = "LEFT"
-                    elif minCost == "above":
-                        cost[i][j] = aboveCost
-                        fromArray[i][j] = "ABOVE"
-                    elif minCost == "diagonal":
-                        cost[i][j] = diagonalCost
-                        fromArray[i][j] = "DIAGONAL"
+        horizontal = horizontalSeq[:cols - 1].encode('latin-1')
+        vertical = verticalSeq[:rows - 1].encode('latin-1')
+        if cutoff is not None:
+            remaining = self.remainingCosts(rows, cols)
+        fromArray = DirectionTable(rows, cols)
+        # row 0 can only come from the left and column 0 only from above
+        cost = [j * INDEL for j in range(cols)]
+        fromArray.setRow(0, [FROM_START] + [FROM_LEFT] * (cols - 1))
+        for i in range(1, rows):
+            prev = cost
+            verticalBase = vertical[i - 1]
+            leftCost = i * INDEL
+            cost = [leftCost]
+            directions = [FROM_ABOVE]
+            for horizontalBase, diagonalCost, aboveCost in zip(horizontal, prev, prev[1:]):
+                diagonalCost += MATCH if horizontalBase == verticalBase else SUB
+                aboveCost += INDEL
+                leftCost += INDEL
+                if diagonalCost <= leftCost and diagonalCost <= aboveCost:
+                    leftCost = diagonalCost
+                    directions.append(FROM_DIAGONAL)
+                elif aboveCost <= leftCost:
+                    leftCost = aboveCost
+                    directions.append(FROM_ABOVE)
+                else:
+                    directions.append(FROM_LEFT)
+                cost.append(leftCost)
+            fromArray.setRow(i, directions)
+            if cutoff is not None and (i % CUTOFF_ROWS == 0 or i == rows - 1):
+                bound = min(map(add, cost, remaining[rows - 1 - i:])) + MATCH * (rows - 1 - i)
+                if bound > cutoff:
+                    return bound, None, None
+        alignment1, alignment2 = self.generateAlignment(
+            horizontalSeq, verticalSeq, fromArray, align_length)
+        return cost[cols-1], alignment1, alignment2
+    '''
+        Lower bound on the cost from a cell to the end cell used by the cutoffs, given
+        d = (columns left) - (rows left) of the cell, less MATCH*(rows left). With r rows
+        and c columns left a path has at most min(r, c) diagonal moves and at least
+        |r - c| indels, so it costs at least MATCH*min(r, c) + INDEL*|r - c|. A row of
+        the table can only be left through one of its cells, so once every cell of a row
+        plus this bound is above the cutoff so is the end cell.
+        Time:
+            O(1)
+        Space:
+            O(1)
+    '''
+
+    def remainingCost(self, d):
+        return INDEL * d if d >= 0 else (INDEL - MATCH) * -d
+    '''
+        remainingCost of every cell of an unrestricted table, from (rows - 1 - i) + j,
+        so a row i of costs lines up with the slice starting at rows - 1 - i
+        Time:
+            O(n + m)
+        Space:
+            O(n + m)
+    '''
+
+    def remainingCosts(self, rows, cols):
+        return [self.remainingCost(cols - 1 - t) for t in range(rows + cols - 1)]
+    '''
+        Encodes a sequence prefix as a uint8 array with a sentinel in front so that
+        index k holds the k-th character (1 based) the same way the DP tables do
+        Time:
+            O(n) one pass over the prefix
+        Space:
+            O(n) one byte per character
+    '''
+
+    def encodeSequence(self, seq, length, sentinel):
+        encoded = np.empty(length + 1, dtype=np.uint8)
+        encoded[0] = sentinel
+        encoded[1:] = np.frombuffer(seq[:length].encode('latin-1'), dtype=np.uint8)
+        return encoded
+    '''
+        Picks the cheapest of left, above and diagonal for a whole vector of cells at once
+        using the same tie breaking as findMin (diagonal, then above, then left)
+        Time:
+            O(c) where c is the number of cells in the vector
+        Space:
+            O(c) for the returned cost and direction vectors
+    '''
+
+    def findMinVector(self, leftCost, aboveCost, diagonalCost):
+        isDiagonal = (diagonalCost <= leftCost) & (diagonalCost <= aboveCost)
+        isAbove = ~isDiagonal & (aboveCost <= leftCost)
+        minCost = np.where(isDiagonal, diagonalCost,
+                           np.where(isAbove, aboveCost, leftCost))
+        direction = np.where(isDiagonal, FROM_DIAGONAL,
+                             np.where(isAbove, FROM_ABOVE, FROM_LEFT))
+        return minCost, direction
+    '''
+        Same as unrestrictedAlignment but fills a whole anti-diagonal per numpy operation.
+        Cells on anti-diagonal d only depend on anti-diagonals d-1 (left, above) and
+        d-2 (diagonal), so only three anti-diagonals of costs are kept, indexed by row.
+        The directions of an anti-diagonal are a strided slice of the flat table.
+        Time:
+            O(nm) cells but only O(n + m) numpy calls
+        Space:
+            O(nm) 1 byte of direction per cell while filling, packed to 2 bits for
+            the traceback
+    '''
+
+    def unrestrictedAlignmentNumpy(self, horizontalSeq, verticalSeq, align_length):
+        cols = min((align_length + 1), len(horizontalSeq) + 1)  # m
+        rows = min((align_length + 1), len(verticalSeq) + 1)  # n
+        horizontal = self.encodeSequence(horizontalSeq, cols - 1, 0)[::-1].copy()
+        vertical = self.encodeSequence(verticalSeq, rows - 1, 1)
+        # diagonal[i + 1] is the cost of cell (i, d - i), index 0 stands for row -1
+        diagonals = [np.full(rows + 1, np.inf) for _ in range(3)]
+        diagonals[2][1] = 0
+        fromArray = np.full(rows * cols, FROM_NONE, dtype=np.uint8)
+        # the cells of an anti-diagonal are cols - 1 apart in the flat table, a single
+        # column has one cell per anti-diagonal and any stride will do for its slice
+        step = max(cols - 1, 1)
+        for d in range(1, rows + cols - 1):
+            older, previous, current = diagonals[1], diagonals[2], diagonals[0]
+            diagonals = [older, previous, current]
+            iStart = max(0, d - cols + 1)
+            iEnd = min(d, rows - 1) + 1
+            diagonalCost = older[iStart:iEnd] + np.where(
+                vertical[iStart:iEnd] == horizontal[cols - 1 - d + iStart:cols - 1 - d + iEnd], MATCH, SUB)
+            aboveCost = previous[iStart:iEnd] + INDEL
+            leftCost = previous[iStart + 1:iEnd + 1] + INDEL
+            first = iStart * (cols - 1) + d
+            cells = slice(first, first + (iEnd - iStart - 1) * step + 1, step)
+            current[iStart + 1:iEnd + 1], fromArray[cells] = self.findMinVector(
+                leftCost, aboveCost, diagonalCost)
+        fromArray = DirectionTable.fromCodes(fromArray.reshape(rows, cols))
         alignment1, alignment2 = self.generateAlignment(
             horizontalSeq, verticalSeq, fromArray, align_length)
-        # print(alignment1, alignment2)
-        return cost[rows-1][cols-1], alignment1, alignment2
+        score = diagonals[2][rows] if rows + cols > 2 else 0
+        return int(score) if score != math.inf else math.inf, alignment1, alignment2
+    '''
+        Same as bandedAlignment but fills a whole band row per numpy operation.
+        Within a row cost[j] = min(D[j], cost[j-1] + INDEL) where D is the best of
+        diagonal and above, which unrolls to a running minimum of D[k] - k*INDEL.
+        A cell only comes from the left when that is strictly cheaper than D so
+        the tie breaking of findMin is kept.
+        Time:
+            O(kn) cells but only O(n) numpy calls
+        Space:
+            O(kn) 1 byte of direction per cell while filling, packed to 2 bits for
+            the traceback, and two band rows of costs
+    '''
+
+    def bandedAlignmentNumpy(self, horizontalSeq, verticalSeq, align_length, maxIndels=MAXINDELS):
+        maxJ = min(align_length, len(horizontalSeq))
+        cols = min((align_length + 1), len(horizontalSeq) + 1)
+        rows = min((align_length + 1), len(verticalSeq) + 1)
+        if abs(cols - rows) > maxIndels:
+            return float('inf'), "No Alignment Possible", "No Alignment Possible"
+        # band column of the end cell (rows - 1, cols - 1), plus one
+        retJ = cols - rows + maxIndels + 1
+        cols = 2*maxIndels + 1  # 2*maxIndels + 1 == k
+        horizontal = self.encodeSequence(horizontalSeq, maxJ, 0)
+        vertical = self.encodeSequence(verticalSeq, rows - 1, 1)
+        # one inf cell on the right so above is always a valid index
+        cost = np.full(cols + 1, np.inf)
+        cost[maxIndels] = 0
+        fromArray = np.full((rows, cols), FROM_NONE, dtype=np.uint8)
+        indelSteps = np.arange(cols + 1) * INDEL
+        for i in range(rows):
+            jStart = max(maxIndels + 1 if i == 0 else 0, maxIndels - i)
+            jEnd = min(cols - 1, maxJ - i + maxIndels) + 1
+            prev = cost
+            if i > 0:
+                cost = np.full(cols + 1, np.inf)
+            if jEnd <= jStart:
+                continue
+            startLeft = cost[jStart - 1] if jStart > 0 else math.inf
+            if i == 0:
+                diagonalCost = np.full(jEnd - jStart, np.inf)
+                aboveCost = diagonalCost
+            else:
+                adjust = i - maxIndels
+                diagonalCost = prev[jStart:jEnd] + np.where(
+                    horizontal[jStart + adjust:jEnd + adjust] == vertical[i], MATCH, SUB)
+                aboveCost = prev[jStart + 1:jEnd + 1] + INDEL
+            isDiagonal = diagonalCost <= aboveCost
+            bestCost = np.where(isDiagonal, diagonalCost, aboveCost)
+            steps = indelSteps[:jEnd - jStart]
+            rowCost = np.minimum(np.minimum.accumulate(bestCost - steps),
+                                 startLeft + INDEL) + steps
+            leftCost = np.empty(jEnd - jStart)
+            leftCost[0] = startLeft + INDEL
+            leftCost[1:] = rowCost[:-1] + INDEL
+            cost[jStart:jEnd] = rowCost
+            fromArray[i][jStart:jEnd] = np.where(
+                leftCost < bestCost, FROM_LEFT,
+                np.where(isDiagonal, FROM_DIAGONAL, FROM_ABOVE))
+        fromArray = DirectionTable.fromCodes(fromArray)
+        alignment1, alignment2 = self.generateBandedAlignment(
+            horizontalSeq, verticalSeq, fromArray, align_length, retJ, maxIndels)
+        score = cost[retJ - 1]
+        return int(score) if score != math.inf else math.inf, alignment1, alignment2
+    '''
+        bandedAlignment for a list of (horizontalSeq, verticalSeq) pairs at once. The band
+        is only k cells wide, too narrow for numpy within one pair, so instead every pair
+        gets a lane of a (pairs x k) array and each band row is a few numpy operations over
+        all the lanes, using the same running minimum as bandedAlignmentNumpy. Pairs can
+        have different lengths, each lane's score is read off when its last row is done.
+        Returns one (score, alignment1, alignment2) per pair, the same as bandedAlignment,
+        or only the scores with scoreOnly. Runs BATCH_LANES pairs at a time.
+        p is the number of pairs
+        Time:
+            O(pkn) cells in O(n) numpy calls per BATCH_LANES pairs, plus the tracebacks
+        Space:
+            O(BATCH_LANES*kn) a byte of direction per cell (none with scoreOnly), the
+            tables of a batch are walked together so they aren't packed like DirectionTable
+    '''
+
+    def bandedAlignmentBatch(self, pairs, align_length, maxIndels=MAXINDELS, scoreOnly=False):
+        results = []
+        for first in range(0, len(pairs), BATCH_LANES):
+            results.extend(self.bandedBatchLanes(
+                pairs[first:first + BATCH_LANES], align_length, maxIndels, scoreOnly))
+        return results
+
+    def bandedBatchLanes(self, pairs, align_length, maxIndels, scoreOnly):
+        impossible = float('inf'), "No Alignment Possible", "No Alignment Possible"
+        results = [impossible[0] if scoreOnly else impossible] * len(pairs)
+        lanes = []
+        for p, (horizontalSeq, verticalSeq) in enumerate(pairs):
+            cols = min((align_length + 1), len(horizontalSeq) + 1)
+            rows = min((align_length + 1), len(verticalSeq) + 1)
+            if abs(cols - rows) <= maxIndels:
+                lanes.append(p)
+        if not lanes:
+            return results
+        k = 2*maxIndels + 1
+        maxJ = np.array([min(align_length, len(pairs[p][0])) for p in lanes])
+        rows = np.array([min(align_length + 1, len(pairs[p][1]) + 1) for p in lanes])
+        # band column of each lane's end cell, plus one
+        retJ = maxJ + 1 - rows + maxIndels + 1
+        maxRows = int(rows.max())
+        # sentinels in front like encodeSequence, the padding after is never read
+        horizontal = np.zeros((len(lanes), maxRows + k + 1), dtype=np.uint8)
+        vertical = np.ones((len(lanes), maxRows), dtype=np.uint8)
+        for lane, p in enumerate(lanes):
+            horizontal[lane, 1:maxJ[lane] + 1] = np.frombuffer(
+                pairs[p][0][:maxJ[lane]].encode('latin-1'), dtype=np.uint8)
+            vertical[lane, 1:rows[lane]] = np.frombuffer(
+                pairs[p][1][:rows[lane] - 1].encode('latin-1'), dtype=np.uint8)
+        scores = np.full(len(lanes), np.inf)
+        fromArray = None if scoreOnly else np.zeros((maxRows, len(lanes), k), dtype=np.uint8)
+        # one inf cell on the right so above is always a valid index
+        cost = np.full((len(lanes), k + 1), np.inf)
+        cost[:, maxIndels] = 0
+        indelSteps = np.arange(k + 1) * INDEL
+        for i in range(maxRows):
+            jStart = max(maxIndels + 1 if i == 0 else 0, maxIndels - i)
+            prev = cost
+            if i > 0:
+                cost = np.full((len(lanes), k + 1), np.inf)
+            if jStart < k:
+                startLeft = cost[:, jStart - 1:jStart] if jStart > 0 else np.inf
+                if i == 0:
+                    diagonalCost = np.full((len(lanes), k - jStart), np.inf)
+                    aboveCost = diagonalCost
+                else:
+                    adjust = i - maxIndels
+                    diagonalCost = prev[:, jStart:k] + np.where(
+                        horizontal[:, jStart + adjust:k + adjust] == vertical[:, i:i + 1],
+                        MATCH, SUB)
+                    aboveCost = prev[:, jStart + 1:k + 1] + INDEL
+                isDiagonal = diagonalCost <= aboveCost
+                bestCost = np.where(isDiagonal, diagonalCost, aboveCost)
+                steps = indelSteps[:k - jStart]
+                rowCost = np.minimum(np.minimum.accumulate(bestCost - steps, axis=1),
+                                     startLeft + INDEL) + steps
+                leftCost = np.empty_like(rowCost)
+                leftCost[:, :1] = startLeft + INDEL
+                leftCost[:, 1:] = rowCost[:, :-1] + INDEL
+                # cells past the end of a lane's horizontal sequence stay empty
+                inside = np.arange(jStart, k) + i - maxIndels <= maxJ[:, None]
+                cost[:, jStart:k] = np.where(inside, rowCost, np.inf)
+                if fromArray is not None:
+                    fromArray[i, :, jStart:] = np.where(
+                        ~inside, FROM_NONE, np.where(
+                            leftCost < bestCost, FROM_LEFT,
+                            np.where(isDiagonal, FROM_DIAGONAL, FROM_ABOVE)))
+            finished = np.nonzero(rows == i + 1)[0]
+            scores[finished] = cost[finished, retJ[finished] - 1]
+        if not scoreOnly:
+            alignments = self.bandedBatchTraceback(
+                fromArray, rows, retJ, horizontal, vertical, maxIndels)
+        for lane, p in enumerate(lanes):
+            score = int(scores[lane]) if scores[lane] != math.inf else math.inf
+            results[p] = score if scoreOnly else (score,) + alignments[lane]
+        return results
+    '''
+        generateBandedAlignment for every lane of bandedBatchLanes at once. All the lanes
+        take one step back per numpy operation, their moves are recorded and each lane's
+        strings are then put together from its moves with a cumulative sum per sequence.
+        Time:
+            O(pn) work in O(n) numpy calls, plus O(p) calls to build the strings
+        Space:
+            O(pn) for the moves
+    '''
+
+    def bandedBatchTraceback(self, fromArray, rows, retJ, horizontal, vertical, maxIndels):
+        lanes = np.arange(len(rows))
+        v = rows - 1
+        h = retJ - 1
+        moves = []
+        active = np.ones(len(rows), dtype=bool)
+        while True:
+            direction = fromArray[v, lanes, h]
+            direction[~active] = FROM_START
+            active = direction != FROM_START
+            if not active.any():
+                break
+            moves.append(direction)
+            v = v - (direction >= FROM_ABOVE)
+            h = h - (direction == FROM_LEFT) + (direction == FROM_ABOVE)
+        if np.any(v != 0) or np.any(h != maxIndels):
+            raise ValueError("UNKNOWN VALUE")
+        moves = np.array(moves, dtype=np.uint8).reshape(-1, len(rows))
+        lengths = np.count_nonzero(moves, axis=0)
+        alignments = []
+        for lane in lanes:
+            laneMoves = moves[lengths[lane] - 1::-1, lane] if lengths[lane] else moves[:0, lane]
+            usesH = laneMoves != FROM_ABOVE
+            usesV = laneMoves != FROM_LEFT
+            # index 0 of the encoded sequences is a sentinel so the k-th character is at k
+            alignment1 = np.where(usesH, horizontal[lane][np.cumsum(usesH)], ord('-'))
+            alignment2 = np.where(usesV, vertical[lane][np.cumsum(usesV)], ord('-'))
+            alignments.append((alignment1.astype(np.uint8).tobytes().decode('latin-1'),
+                               alignment2.astype(np.uint8).tobytes().decode('latin-1')))
+        return alignments
+    '''
+        Computes one DP row with numpy given the row above it. prevCost and the returned
+        row cover the region's columns c0..c1 where column c0 is a boundary column whose
+        cost for this row is leftCost. Uses the same running minimum and tie breaking as
+        bandedAlignmentNumpy.
+        Time:
+            O(w) where w is the width of the row
+        Space:
+            O(w) for the new row and its pointers
+    '''
 
+    def alignmentRow(self, prevCost, leftCost, horizontal, verticalChar):
+        width = len(horizontal)
+        diagonalCost = prevCost[:-1] + np.where(horizontal == verticalChar, MATCH, SUB)
+        aboveCost = prevCost[1:] + INDEL
+        isDiagonal = diagonalCost <= aboveCost
+        bestCost = np.where(isDiagonal, diagonalCost, aboveCost)
+        steps = np.arange(width) * INDEL
+        rowCost = np.empty(width + 1)
+        rowCost[0] = leftCost
+        rowCost[1:] = np.minimum(np.minimum.accumulate(bestCost - steps),
+                                 leftCost + INDEL) + steps
+        pointers = np.where(rowCost[:-1] + INDEL < bestCost, FROM_LEFT,
+                            np.where(isDiagonal, FROM_DIAGONAL, FROM_ABOVE))
+        return rowCost, pointers
+    '''
+        Gotoh's affine gap alignment of the prefixes. Each cell has three costs: H the
+        best of any path to it, F of paths ending in a vertical gap and E of paths ending
+        in a horizontal gap, where a gap either opens from H or extends the one before.
+        H breaks ties diagonal, then above (F), then left (E), and a gap opens rather than
+        extends on a tie, so with gapOpen == gapExtend the scores and alignments are the
+        ones of unrestrictedAlignment. engine 'python' fills cell by cell, anything else
+        a row at a time with numpy (see affineRowsNumpy). Returns (score, alignment1,
+        alignment2), only the score with scoreOnly.
+        n and m are the lengths of the strings
+        Time:
+            O(nm) three costs per cell
+        Space:
+            O(nm) one byte of pointers per cell, O(m) with scoreOnly
+    '''
+
+    def affineAlignment(self, horizontalSeq, verticalSeq, align_length, scoring=None,
+                        engine='python', scoreOnly=False):
+        cols = min((align_length + 1), len(horizontalSeq) + 1)
+        rows = min((align_length + 1), len(verticalSeq) + 1)
+        return self.affineTable(horizontalSeq, verticalSeq, rows, cols, cols - 1, 0, 0,
+                                scoring, engine, scoreOnly)
+    '''
+        affineAlignment limited to the band of bandedAlignment, the same k = 2*maxIndels + 1
+        cells per row and the same "No Alignment Possible" when the lengths differ by more
+        than maxIndels. With gapOpen == gapExtend it gives the results of bandedAlignment.
+        k is bandwidth and n is the length of the smaller string
+        Time:
+            O(kn) three costs per cell
+        Space:
+            O(kn) one byte of pointers per cell, O(k) with scoreOnly
+    '''
+
+    def affineBandedAlignment(self, horizontalSeq, verticalSeq, align_length, scoring=None,
+                              engine='python', scoreOnly=False, maxIndels=MAXINDELS):
+        maxJ = min(align_length, len(horizontalSeq))
+        cols = min((align_length + 1), len(horizontalSeq) + 1)
+        rows = min((align_length + 1), len(verticalSeq) + 1)
+        if abs(cols - rows) > maxIndels:
+            if scoreOnly:
+                return float('inf')
+            return float('inf'), "No Alignment Possible", "No Alignment Possible"
+        return self.affineTable(horizontalSeq, verticalSeq, rows, 2*maxIndels + 1, maxJ, 1,
+                                maxIndels, scoring, engine, scoreOnly)
+    '''
+        Shared by affineAlignment and affineBandedAlignment. Cell b of row i is in column
+        b + shift*i - offset (shift 0 and offset 0 for the whole table, shift 1 and offset
+        maxIndels for a band), so its diagonal neighbour is cell b - 1 + shift of the row
+        above and its above neighbour cell b + shift. Cells of columns outside 0..maxJ
+        are left at inf. The pointers of a cell are one byte: the FROM_ code of H in the
+        low two bits, 4 when F extends the gap above and 8 when E extends the gap on the
+        left.
+        Time:
+            O(rows * width)
+        Space:
+            O(rows * width) for the pointers, O(width) with scoreOnly
+    '''
+
+    def affineTable(self, horizontalSeq, verticalSeq, rows, width, maxJ, shift, offset, scoring,
+                    engine, scoreOnly):
+        if scoring is None:
+            scoring = Scoring()
+        fill = self.affineRows if engine == 'python' else self.affineRowsNumpy
+        lastRow, pointers = fill(horizontalSeq, verticalSeq, rows, width, maxJ, shift, offset,
+                                 scoring, not scoreOnly)
+        # the end cell is (rows - 1, maxJ) for both
+        score = lastRow[maxJ - shift*(rows - 1) + offset]
+        score = int(score) if score != math.inf else math.inf
+        if scoreOnly:
+            return score
+        alignment1, alignment2 = self.generateAffineAlignment(
+            horizontalSeq, verticalSeq, pointers, width, shift, offset, rows - 1, maxJ)
+        return score, alignment1, alignment2
+    '''
+        Cell by cell fill of affineTable. Only the H and F costs of the row above are
+        kept, E only ever comes from the cell on the left. Returns the H costs of the last
+        row (cell b at index b) and the pointers as a bytearray of rows * width, None
+        without keepPointers.
+        Time:
+            O(rows * width)
+        Space:
+            O(rows * width) for the pointers, O(width) without
+    '''
+
+    def affineRows(self, horizontalSeq, verticalSeq, rows, width, maxJ, shift, offset, scoring,
+                   keepPointers):
+        inf = float('inf')
+        match, sub = scoring.match, scoring.sub
+        gapOpen, gapExtend = scoring.gapOpen, scoring.gapExtend
+        horizontal = horizontalSeq[:maxJ].encode('latin-1')
+        vertical = verticalSeq[:rows - 1].encode('latin-1')
+        pointers = bytearray(rows * width) if keepPointers else None
+        # cell b is at index b + 1, one inf cell each side so every neighbour is an index
+        costH = [inf] * (width + 2)
+        costF = [inf] * (width + 2)
+        for i in range(rows):
+            prevH, prevF = costH, costF
+            costH = [inf] * (width + 2)
+            costF = [inf] * (width + 2)
+            leftH = leftE = inf
+            verticalBase = vertical[i - 1] if i > 0 else None
+            first = max(0, offset - shift*i)
+            last = min(width - 1, maxJ - shift*i + offset)
+            for b in range(first, last + 1):
+                j = b + shift*i - offset
+                pointer = 0
+                openCost = prevH[b + 1 + shift] + gapOpen
+                extendCost = prevF[b + 1 + shift] + gapExtend
+                if extendCost < openCost:
+                    gapF = extendCost
+                    pointer = 4
+                else:
+                    gapF = openCost
+                openCost = leftH + gapOpen
+                extendCost = leftE + gapExtend
+                if extendCost < openCost:
+                    leftE = extendCost
+                    pointer |= 8
+                else:
+                    leftE = openCost
+                if j == 0:
+                    # no diagonal into column 0, and (0, 0) is the start
+                    diagonalCost = 0 if i == 0 else inf
+                else:
+                    diagonalCost = prevH[b + shift] + (
+                        match if horizontal[j - 1] == verticalBase else sub) if i > 0 else inf
+                if i == 0 and j == 0:
+                    leftH = 0
+                    pointer = FROM_START
+                elif diagonalCost <= gapF and diagonalCost <= leftE:
+                    leftH = diagonalCost
+                    pointer |= FROM_DIAGONAL
+                elif gapF <= leftE:
+                    leftH = gapF
+                    pointer |= FROM_ABOVE
+                else:
+                    leftH = leftE
+                    pointer |= FROM_LEFT
+                costH[b + 1] = leftH
+                costF[b + 1] = gapF
+                if pointers is not None:
+                    pointers[i * width + b] = pointer
+        return costH[1:width + 1], pointers
+    '''
+        Same as affineRows with a row per numpy operation. F and the diagonal only
+        depend on the row above. E[b] = min(H[b-1] + gapOpen, E[b-1] + gapExtend) and,
+        as gapOpen >= gapExtend, opening a gap after E is never cheaper than extending
+        it, so E[b] is the best G[c] + gapOpen + (b-1-c)*gapExtend over c < b where G is
+        the best of diagonal and F. That is the running minimum of G[c] - c*gapExtend,
+        the same trick as alignmentRow.
+        Time:
+            O(rows * width) cells but only O(rows) numpy calls
+        Space:
+            O(rows * width) for the pointers, O(width) without
+    '''
+
+    def affineRowsNumpy(self, horizontalSeq, verticalSeq, rows, width, maxJ, shift, offset,
+                        scoring, keepPointers):
+        gapOpen, gapExtend = scoring.gapOpen, scoring.gapExtend
+        # column j of the row is at index j + offset, the rest never match and aren't valid
+        padding = offset + width + 1
+        horizontal = np.zeros(maxJ + 1 + 2 * padding, dtype=np.uint8)
+        horizontal[offset + 1:offset + 1 + maxJ] = np.frombuffer(
+            horizontalSeq[:maxJ].encode('latin-1'), dtype=np.uint8)
+        # no diagonal into column 0 or a column outside the table
+        outside = np.full(len(horizontal), np.inf)
+        outside[offset + 1:offset + 1 + maxJ] = 0
+        vertical = self.encodeSequence(verticalSeq, rows - 1, 1)
+        pointers = np.zeros((rows, width), dtype=np.uint8) if keepPointers else None
+        steps = np.arange(width - 1) * float(gapExtend)
+        costH = np.full(width + 2, np.inf)
+        costF = np.full(width + 2, np.inf)
+        for i in range(rows):
+            gapF = np.minimum(costH[1 + shift:1 + shift + width] + gapOpen,
+                              costF[1 + shift:1 + shift + width] + gapExtend)
+            extendsF = costF[1 + shift:1 + shift + width] + gapExtend < \
+                costH[1 + shift:1 + shift + width] + gapOpen
+            if i > 0:
+                columns = slice(shift*i, shift*i + width)
+                diagonalCost = costH[shift:shift + width] + outside[columns] + np.where(
+                    horizontal[columns] == vertical[i], scoring.match, scoring.sub)
+            else:
+                diagonalCost = np.full(width, np.inf)
+                diagonalCost[offset] = 0
+            isDiagonal = diagonalCost <= gapF
+            best = np.where(isDiagonal, diagonalCost, gapF)
+            gapE = np.empty(width)
+            gapE[0] = np.inf
+            gapE[1:] = np.minimum.accumulate(best[:-1] - steps) + gapOpen + steps
+            # cells past column maxJ
+            end = maxJ - shift*i + offset + 1
+            if end < width:
+                gapE[end:] = np.inf
+                best[end:] = np.inf
+            isLeft = gapE < best
+            rowH = np.where(isLeft, gapE, best)
+            if pointers is not None:
+                extendsE = np.zeros(width, dtype=bool)
+                extendsE[1:] = gapE[:-1] + gapExtend < rowH[:-1] + gapOpen
+                pointers[i] = np.where(isLeft, FROM_LEFT,
+                                       np.where(isDiagonal, FROM_DIAGONAL, FROM_ABOVE)) \
+                    | (extendsF << 2) | (extendsE << 3)
+                if i == 0:
+                    pointers[0, offset] = FROM_START
+            costH = np.full(width + 2, np.inf)
+            costF = np.full(width + 2, np.inf)
+            costH[1:width + 1] = rowH
+            costF[1:width + 1] = gapF
+        return costH[1:width + 1], pointers.tobytes() if pointers is not None else None
+    '''
+        Follows the pointers of affineTable back from cell (i, j), switching between the
+        H, F and E tables as they say, and returns the alignment strings
+        Time:
+            O(n + m) the length of the alignment
+        Space:
+            O(n + m)
+    '''
+
+    def generateAffineAlignment(self, horizontalSeq, verticalSeq, pointers, width, shift, offset,
+                                i, j):
+        horizontalAlignment = []
+        verticalAlignment = []
+        # which table the path is in, H (any), F (vertical gap) or E (horizontal gap)
+        table = 'H'
+        while True:
+            pointer = pointers[i * width + j - shift*i + offset]
+            if table == 'H':
+                direction = pointer & 3
+                if direction == FROM_START:
+                    break
+                if direction == FROM_DIAGONAL:
+                    verticalAlignment.append(verticalSeq[i-1])
+                    horizontalAlignment.append(horizontalSeq[j-1])
+                    i -= 1
+                    j -= 1
+                else:
+                    table = 'F' if direction == FROM_ABOVE else 'E'
+            elif table == 'F':
+                verticalAlignment.append(verticalSeq[i-1])
+                horizontalAlignment.append("-")
+                table = 'F' if pointer & 4 else 'H'
+                i -= 1
+            else:
+                verticalAlignment.append("-")
+                horizontalAlignment.append(horizontalSeq[j-1])
+                table = 'E' if pointer & 8 else 'H'
+                j -= 1
+        if i != 0 or j != 0:
+            raise ValueError("UNKNOWN VALUE")
+        return "".join(horizontalAlignment[::-1]), "".join(verticalAlignment[::-1])
+    '''
+        Runs the DP forward over the rows r0+1..r1 and columns c0..c1 of a region whose
+        top row (row r0) and left column (column c0) costs are given.
+        When trackExits is set it also carries, for every cell, where its traceback
+        leaves the region: a column c >= 0 for cell (r0, c) on the top row or -(r+1)
+        for cell (r, c0) on the left column. A cell inherits the exit of whichever
+        neighbour its pointer points to, which for a run of LEFT pointers is a
+        forward fill along the row.
+        Time:
+            O(hw) for a region of h rows and w columns
+        Space:
+            O(w + h) only the current row and the rightmost column are kept
+    '''
+
+    def hirschbergForward(self, horizontal, vertical, r0, r1, c0, c1, top, left, trackExits=False):
+        rowCost = top
+        rightColumn = [top[-1]]
+        exits = np.arange(c0, c1 + 1) if trackExits else None
+        columns = np.arange(c1 - c0 + 1)
+        for i in range(r0 + 1, r1 + 1):
+            rowCost, pointers = self.alignmentRow(
+                rowCost, left[i - r0], horizontal[c0 + 1:c1 + 1], vertical[i])
+            rightColumn.append(rowCost[-1])
+            if trackExits:
+                inherited = np.empty(c1 - c0 + 1, dtype=exits.dtype)
+                inherited[0] = -(i + 1)
+                inherited[1:] = np.where(pointers == FROM_DIAGONAL, exits[:-1], exits[1:])
+                source = np.where(pointers == FROM_LEFT, 0, columns[1:])
+                exits = inherited[np.maximum.accumulate(np.concatenate(([0], source)))]
+        return rowCost, np.array(rightColumn), exits
+    '''
+        Traceback of a region small enough to keep its pointers. Follows the pointers
+        from (r1, c1) until the path reaches the top row or left column of the region.
+        Time:
+            O(hw) to fill the pointers
+        Space:
+            O(hw) bounded by HIRSCHBERG_BASE_CELLS
+    '''
+
+    def hirschbergBase(self, horizontal, vertical, r0, r1, c0, c1, top, left, moves):
+        fromArray = []
+        rowCost = top
+        for i in range(r0 + 1, r1 + 1):
+            rowCost, pointers = self.alignmentRow(
+                rowCost, left[i - r0], horizontal[c0 + 1:c1 + 1], vertical[i])
+            fromArray.append(pointers.tolist())
+        i, j = r1, c1
+        while i > r0 and j > c0:
+            pointer = fromArray[i - r0 - 1][j - c0 - 1]
+            moves.append(pointer)
+            if pointer == FROM_LEFT:
+                j -= 1
+            elif pointer == FROM_ABOVE:
+                i -= 1
+            else:
+                i -= 1
+                j -= 1
+        return i, j
+    '''
+        Appends to moves the traceback (last move first) of the region with top row r0,
+        left column c0 and end cell (r1, c1), and returns the cell where the path leaves
+        the region. The rows are split at mid, the bottom half is filled once to find
+        the column c where the path crosses row mid, and each half is solved on its own.
+        The bottom half only needs columns c-1..c1, whose left column is filled by one
+        more pass, so every sub region sees exactly the costs of the full table and the
+        path is the same one generateAlignment would follow.
+        Time:
+            O(hw) about three fills of the region in total
+        Space:
+            O(h + w) per level of recursion for the boundary rows and columns
+    '''
+
+    def hirschbergTrace(self, horizontal, vertical, r0, r1, c0, c1, top, left, moves):
+        if r1 == r0 or c1 == c0:
+            return r1, c1
+        if r1 - r0 == 1 or (r1 - r0) * (c1 - c0) <= HIRSCHBERG_BASE_CELLS:
+            return self.hirschbergBase(horizontal, vertical, r0, r1, c0, c1, top, left, moves)
+        mid = (r0 + r1) // 2
+        midRow, _, _ = self.hirschbergForward(
+            horizontal, vertical, r0, mid, c0, c1, top, left[:mid - r0 + 1])
+        bottomLeft = left[mid - r0:]
+        _, _, exits = self.hirschbergForward(
+            horizontal, vertical, mid, r1, c0, c1, midRow, bottomLeft, trackExits=True)
+        exit = exits[-1]
+        if exit < 0:
+            # the path leaves through the left column without touching the top half
+            return self.hirschbergTrace(
+                horizontal, vertical, mid, r1, c0, c1, midRow, bottomLeft, moves)
+        c = int(exit)
+        if c > c0:
+            _, bottomLeft, _ = self.hirschbergForward(
+                horizontal, vertical, mid, r1, c0, c - 1, midRow[:c - c0], bottomLeft)
+            self.hirschbergTrace(
+                horizontal, vertical, mid, r1, c - 1, c1, midRow[c - 1 - c0:], bottomLeft, moves)
+        else:
+            self.hirschbergTrace(
+                horizontal, vertical, mid, r1, c0, c1, midRow, bottomLeft, moves)
+        return self.hirschbergTrace(
+            horizontal, vertical, r0, mid, c0, c, top[:c - c0 + 1], left[:mid - r0 + 1], moves)
+    '''
+        Linear space version of unrestrictedAlignment (Hirschberg divide and conquer).
+        Returns the same score and alignment strings without ever holding the n by m
+        cost or fromArray tables, so whole genomes can be aligned.
+        n and m are the lengths of the strings
+        Time:
+            O(nm) about three times the cells of unrestrictedAlignment
+        Space:
+            O(n + m) for the boundary rows, the moves and the alignment strings
+            (each level of the recursion keeps its own boundaries, O((n + m) log n) at worst)
+    '''
+
+    def hirschbergAlignment(self, horizontalSeq, verticalSeq, align_length):
+        if np is None:
+            raise ImportError("hirschbergAlignment requires numpy to be installed")
+        cols = min((align_length + 1), len(horizontalSeq) + 1)  # m
+        rows = min((align_length + 1), len(verticalSeq) + 1)  # n
+        horizontal = self.encodeSequence(horizontalSeq, cols - 1, 0)
+        vertical = self.encodeSequence(verticalSeq, rows - 1, 1)
+        moves = bytearray()
+        i, j = self.hirschbergTrace(
+            horizontal, vertical, 0, rows - 1, 0, cols - 1,
+            np.arange(cols) * float(INDEL), np.arange(rows) * float(INDEL), moves)
+        # row 0 only comes from the left and column 0 only from above
+        moves.extend([FROM_LEFT] * j)
+        moves.extend([FROM_ABOVE] * i)
+        horizontalAlignment = []
+        verticalAlignment = []
+        score = 0
+        v = h = 0
+        for move in reversed(moves):
+            if move == FROM_LEFT:
+                horizontalAlignment.append(horizontalSeq[h])
+                verticalAlignment.append("-")
+                score += INDEL
+                h += 1
+            elif move == FROM_ABOVE:
+                horizontalAlignment.append("-")
+                verticalAlignment.append(verticalSeq[v])
+                score += INDEL
+                v += 1
+            else:
+                horizontalAlignment.append(horizontalSeq[h])
+                verticalAlignment.append(verticalSeq[v])
+                score += MATCH if horizontalSeq[h] == verticalSeq[v] else SUB
+                h += 1
+                v += 1
+        return score, "".join(horizontalAlignment), "".join(verticalAlignment)
+    '''
+        Score only version of unrestrictedAlignment. Only the previous and current rows
+        are kept and no fromArray is built, so there is nothing to trace back. Ties
+        don't matter for the cost so a plain min is enough.
+        n and m are the lengths of the strings
+        Time:
+            O(nm) same cells as unrestrictedAlignment
+        Space:
+            O(m) two rows
+        cutoff stops it early the same way as unrestrictedAlignment, returning the bound
+    '''
+
+    def unrestrictedScore(self, horizontalSeq, verticalSeq, align_length, cutoff=None):
+        cols = min((align_length + 1), len(horizontalSeq) + 1)  # m
+        rows = min((align_length + 1), len(verticalSeq) + 1)  # n
+        horizontal = horizontalSeq[:cols - 1]
+        if cutoff is not None:
+            remaining = self.remainingCosts(rows, cols)
+        prev = [j * INDEL for j in range(cols)]
+        for i in range(1, rows):
+            verticalChar = verticalSeq[i - 1]
+            leftCost = i * INDEL
+            row = [leftCost]
+            for horizontalChar, diagonalCost, aboveCost in zip(horizontal, prev, prev[1:]):
+                diagonalCost += MATCH if horizontalChar == verticalChar else SUB
+                aboveCost += INDEL
+                leftCost += INDEL
+                if diagonalCost < leftCost:
+                    leftCost = diagonalCost
+                if aboveCost < leftCost:
+                    leftCost = aboveCost
+                row.append(leftCost)
+            prev = row
+            if cutoff is not None and (i % CUTOFF_ROWS == 0 or i == rows - 1):
+                bound = min(map(add, row, remaining[rows - 1 - i:])) + MATCH * (rows - 1 - i)
+                if bound > cutoff:
+                    return bound
+        return prev[cols - 1]
+    '''
+        Score only version of unrestrictedAlignmentNumpy, one numpy row at a time
+        n and m are the lengths of the strings
+        Time:
+            O(nm) cells but only O(n) numpy calls
+        Space:
+            O(m) two rows
+    '''
+
+    def unrestrictedScoreNumpy(self, horizontalSeq, verticalSeq, align_length):
+        cols = min((align_length + 1), len(horizontalSeq) + 1)  # m
+        rows = min((align_length + 1), len(verticalSeq) + 1)  # n
+        horizontal = self.encodeSequence(horizontalSeq, cols - 1, 0)
+        vertical = self.encodeSequence(verticalSeq, rows - 1, 1)
+        lastRow, _, _ = self.hirschbergForward(
+            horizontal, vertical, 0, rows - 1, 0, cols - 1,
+            np.arange(cols) * float(INDEL), np.arange(rows) * float(INDEL))
+        return int(lastRow[-1])
+    '''
+        Score only version of bandedAlignment, keeping two band rows instead of the
+        whole band and returning the same cell bandedAlignment would
+        k is the bandwidth and n is the length of the smaller string
+        Time:
+            O(kn) same cells as bandedAlignment
+        Space:
+            O(k) two band rows
+        cutoff stops it early the same way as bandedAlignment, returning the bound
+    '''
+
+    def bandedScore(self, horizontalSeq, verticalSeq, align_length, maxIndels=MAXINDELS,
+                    cutoff=None):
+        maxJ = min(align_length, len(horizontalSeq))
+        cols = min((align_length + 1), len(horizontalSeq) + 1)
+        rows = min((align_length + 1), len(verticalSeq) + 1)
+        if abs(cols - rows) > maxIndels:
+            return float('inf')
+        # band column of the end cell (rows - 1, cols - 1), plus one
+        retJ = cols - rows + maxIndels + 1
+        cols = 2*maxIndels + 1  # 2*maxIndels + 1 == k
+        if cutoff is not None:
+            remaining = [self.remainingCost(maxJ + maxIndels - j - rows + 1)
+                         for j in range(cols + 1)]
+        prev = None
+        row = [float('inf')] * (cols + 1)
+        row[maxIndels] = 0
+        for i in range(rows):
+            if i > 0:
+                prev = row
+                row = [float('inf')] * (cols + 1)
+            for j in range(cols):
+                if i == 0 and j <= maxIndels:
+                    continue
+                adjustJ = j + i - maxIndels
+                if adjustJ > maxJ or adjustJ < 0:
+                    continue
+                best = row[j - 1] + INDEL if j > 0 else float('inf')
+                if i > 0:
+                    diagonalCost = prev[j] + (
+                        MATCH if horizontalSeq[adjustJ - 1] == verticalSeq[i - 1] else SUB) \
+                        if adjustJ > 0 else float('inf')
+                    aboveCost = prev[j + 1] + INDEL
+                    best = min(best, diagonalCost, aboveCost)
+                row[j] = best
+            if cutoff is not None and (i % CUTOFF_ROWS == 0 or i == rows - 1):
+                bound = min(map(add, row, remaining)) + MATCH * (rows - 1 - i)
+                if bound > cutoff:
+                    return bound
+        return row[retJ - 1]
+    '''
+        True when no path that leaves the band of maxIndels diagonals either side can
+        cost less than score, so score is the unrestricted optimum. Every path with S
+        substitutions and I indels between prefixes of lengths n and m costs
+            MATCH*(n+m)/2 + (SUB-MATCH)*S + (INDEL-MATCH/2)*I
+        and one that leaves the band needs at least 2*(maxIndels+1) - |n-m| indels.
+        The test is strict so no optimal path is outside the band, which makes the
+        banded traceback the same as the unrestricted one.
+        Time:
+            O(1)
+        Space:
+            O(1)
+    '''
+
+    def bandIsExact(self, score, n, m, maxIndels):
+        outsideIndels = 2 * (maxIndels + 1) - abs(n - m)
+        return 2 * score < MATCH * (n + m) + (2 * INDEL - MATCH) * outsideIndels
+    '''
+        Banded alignment that starts at MAXINDELS (or the length difference) and doubles
+        the band until bandIsExact proves the result is the unrestricted optimum, or the
+        band covers the whole table. Gives the same score and alignments as
+        unrestrictedAlignment. The final bandwidth (2*maxIndels + 1) goes in
+        details['bandwidth'] when details is given.
+        d is the number of band cells needed, about the edit distance between the strings
+        Time:
+            O(dn) the doublings add up to at most twice the final band
+        Space:
+            O(dn) for the DirectionTable of the final band
+    '''
+
+    def adaptiveBandedAlignment(self, horizontalSeq, verticalSeq, align_length, engine='python',
+                                details=None, scoreOnly=False):
+        bandedAlignment, _ = self.getEngine(engine)
+        n = min(align_length, len(verticalSeq))
+        m = min(align_length, len(horizontalSeq))
+        maxIndels = max(MAXINDELS, abs(n - m))
+        while True:
+            if scoreOnly:
+                result = self.bandedScore(horizontalSeq, verticalSeq, align_length, maxIndels)
+                score = result
+            else:
+                result = bandedAlignment(horizontalSeq, verticalSeq, align_length, maxIndels)
+                score = result[0]
+            if maxIndels >= max(n, m) or self.bandIsExact(score, n, m, maxIndels):
+                break
+            maxIndels *= 2
+        if details is not None:
+            details['bandwidth'] = 2*maxIndels + 1
+        return result
+    '''
+        Seed and extend alignment for sequences too long for a full table. Exact matches
+        of k bases (seedAnchors) are chained into the heaviest run that goes forward in
+        both sequences without wandering off the diagonal (chainAnchors). The anchors are
+        aligned base for base and the gaps between them, and before the first and after
+        the last, are filled with the banded alignment of the engine, widened until it is
+        the gap's optimum (adaptiveBandedAlignment). It is a heuristic, the result is a
+        valid alignment and its score is never below the unrestricted optimum but can be
+        above it when the best alignment doesn't go through the anchors.
+        GeneSequencingBenchmark.py seeded measures how far. The number of anchors and the
+        bases they cover go in details when it is given.
+        n and m are the lengths of the strings, g the bases left between anchors and d
+        the band cells the gaps need
+        Time:
+            O(n + m) to seed and O(sw) to chain s anchors, plus O(dg) for the gaps,
+            near linear for related sequences
+        Space:
+            O(m) for the k-mer index and the alignment plus the band of the largest gap
+            (s is the number of anchors and w is SEED_CHAIN_WINDOW)
+    '''
+
+    def seededAlignment(self, horizontalSeq, verticalSeq, align_length, engine='python',
+                        details=None, k=SEED_KMER):
+        horizontal = horizontalSeq[:align_length]
+        vertical = verticalSeq[:align_length]
+        chain = self.chainAnchors(self.seedAnchors(horizontal, vertical, k))
+        score = 0
+        horizontalParts = []
+        verticalParts = []
+        p = q = 0
+        for anchorQ, anchorP, length in chain + [(len(vertical), len(horizontal), 0)]:
+            gapScore, gapHorizontal, gapVertical = self.alignGap(
+                horizontal[p:anchorP], vertical[q:anchorQ], engine)
+            score += gapScore + MATCH * length
+            horizontalParts += [gapHorizontal, horizontal[anchorP:anchorP + length]]
+            verticalParts += [gapVertical, vertical[anchorQ:anchorQ + length]]
+            p, q = anchorP + length, anchorQ + length
+        if details is not None:
+            details['anchors'] = len(chain)
+            details['anchored_bases'] = sum(length for _, _, length in chain)
+        return score, "".join(horizontalParts), "".join(verticalParts)
+    '''
+        Exact matches between the two strings as (vertical start, horizontal start,
+        length), found through a hash index of the k-mers of horizontal. Hits on the same
+        diagonal at consecutive positions are merged into one anchor, so each anchor is a
+        maximal run of matching k-mers. k-mers with more than SEED_MAX_HITS positions are
+        skipped.
+        Time:
+            O(n + m) for sequences without many repeats
+        Space:
+            O(m) for the index
+    '''
+
+    def seedAnchors(self, horizontal, vertical, k):
+        index = {}
+        for p in range(len(horizontal) - k + 1):
+            index.setdefault(horizontal[p:p + k], []).append(p)
+        anchors = []
+        # diagonal (p - q) -> [first q, last q] of the run of hits on it
+        runs = {}
+        for q in range(len(vertical) - k + 1):
+            hits = index.get(vertical[q:q + k], ())
+            if len(hits) > SEED_MAX_HITS:
+                continue
+            for p in hits:
+                run = runs.get(p - q)
+                if run is not None and run[1] == q - 1:
+                    run[1] = q
+                    continue
+                if run is not None:
+                    anchors.append((run[0], run[0] + p - q, run[1] - run[0] + k))
+                runs[p - q] = [q, q]
+        for diagonal, (first, last) in runs.items():
+            anchors.append((first, first + diagonal, last - first + k))
+        return anchors
+    '''
+        The best chain of anchors in which each anchor starts after the one before ends,
+        in both strings. A chain is worth -MATCH for every base its anchors cover, less
+        INDEL for every diagonal it moves between two anchors (the indels the gap needs
+        at least), so a lone spurious seed far off the diagonal isn't worth the detour.
+        Anchors are visited by start in vertical and each only looks back at the
+        SEED_CHAIN_WINDOW anchors before it for the one to follow.
+        s is the number of anchors and w the window
+        Time:
+            O(s log s + sw)
+        Space:
+            O(s)
+    '''
+
+    def chainAnchors(self, anchors):
+        anchors = sorted(anchors)
+        value = []
+        previous = []
+        for b, (anchorQ, anchorP, length) in enumerate(anchors):
+            best = -MATCH * length
+            bestPrevious = -1
+            for a in range(max(0, b - SEED_CHAIN_WINDOW), b):
+                endQ, endP, endLength = anchors[a]
+                if endQ + endLength > anchorQ or endP + endLength > anchorP:
+                    continue
+                candidate = value[a] - MATCH * length - \
+                    INDEL * abs((anchorP - anchorQ) - (endP - endQ))
+                if candidate > best:
+                    best = candidate
+                    bestPrevious = a
+            value.append(best)
+            previous.append(bestPrevious)
+        chain = []
+        last = max(range(len(anchors)), key=value.__getitem__) if anchors else -1
+        while last != -1:
+            chain.append(anchors[last])
+            last = previous[last]
+        return chain[::-1]
+    '''
+        Aligns one gap of seededAlignment. A gap with nothing on one side is all indels,
+        otherwise adaptiveBandedAlignment gives its optimum, in a band just wide enough.
+        Time and space:
+            O(dg) for a gap of g bases that needs d band cells, see adaptiveBandedAlignment
+    '''
+
+    def alignGap(self, horizontal, vertical, engine):
+        if not horizontal or not vertical:
+            return INDEL * (len(horizontal) + len(vertical)), \
+                horizontal + "-" * len(vertical), "-" * len(horizontal) + vertical
+        return self.adaptiveBandedAlignment(horizontal, vertical,
+                                            max(len(horizontal), len(vertical)), engine)
+    '''
+        Unit cost edit distance between the first align_length characters of the two
+        strings with Myers' bit-parallel algorithm (Hyyro's global version). Column j of
+        the edit distance table is kept as two bit vectors of the +1 and -1 steps down the
+        column (vertical deltas), held in python ints so each operation updates a whole
+        column at a time, a machine word of cells per step. score follows the last row.
+        n and m are the lengths of the prefixes, w the machine word size
+        Time:
+            O(n*m/w)
+        Space:
+            O(m/w) plus one bit mask per distinct character of verticalSeq
+    '''
+
+    def editDistance(self, horizontalSeq, verticalSeq, align_length):
+        horizontal = horizontalSeq[:align_length]
+        vertical = verticalSeq[:align_length]
+        m = len(vertical)
+        if m == 0:
+            return len(horizontal)
+        peq = {}
+        for k, char in enumerate(vertical):
+            peq[char] = peq.get(char, 0) | (1 << k)
+        full = (1 << m) - 1
+        last = 1 << (m - 1)
+        plusV = full
+        minusV = 0
+        score = m
+        for char in horizontal:
+            eq = peq.get(char, 0)
+            xv = eq | minusV
+            xh = (((eq & plusV) + plusV) ^ plusV) | eq
+            plusH = minusV | (~(xh | plusV) & full)
+            minusH = plusV & xh
+            if plusH & last:
+                score += 1
+            elif minusH & last:
+                score -= 1
+            # the top row of a global alignment goes up by one each column
+            plusH = ((plusH << 1) | 1) & full
+            minusH = (minusH << 1) & full
+            plusV = minusH | (~(xv | plusH) & full)
+            minusV = plusH & xv
+        return score
+    '''
+        Lower bound on the alignment cost of the pair from its edit distance. An alignment
+        with S substitutions and I indels costs
+            MATCH*(n+m)/2 + (SUB-MATCH)*S + (INDEL-MATCH/2)*I
+        and S + I can't be less than the edit distance. Every strategy's cost is at least
+        the unrestricted one, so the bound holds for all of them.
+        Returns (bound, edit distance)
+        Time:
+            O(n*m/w) see editDistance
+        Space:
+            O(m/w)
+    '''
+
+    def costLowerBound(self, horizontalSeq, verticalSeq, align_length):
+        n = min(align_length, len(verticalSeq))
+        m = min(align_length, len(horizontalSeq))
+        distance = self.editDistance(horizontalSeq, verticalSeq, align_length)
+        twiceBound = MATCH * (n + m) + min(2 * (SUB - MATCH), 2 * INDEL - MATCH) * distance
+        # costs are whole numbers
+        return -(-twiceBound // 2), distance
+    '''
+        Fills rows r0+1..r1 and columns c0+1..c1 of an unrestricted table given its row
+        r0 from column c0 (top) and its column c0 from row r0 (left). Returns the costs of
+        row r1 from column c0, of column c1 from row r0 and the region's pointers as a
+        DirectionTable (None with scoreOnly). The python engine works cell by cell like
+        unrestrictedAlignment, the others a row at a time with alignmentRow.
+        Time:
+            O(hw) for a region of h rows and w columns
+        Space:
+            O(hw) for the pointers, O(h + w) with scoreOnly
+    '''
+
+    def fillRegion(self, horizontalSeq, verticalSeq, r0, r1, c0, c1, top, left, engine,
+                   scoreOnly):
+        if c1 == c0:
+            # nothing to fill, the costs are all in left
+            return [left[-1]], list(left), None if scoreOnly else DirectionTable(r1 - r0, 0)
+        if engine != 'python':
+            return self.fillRegionNumpy(horizontalSeq, verticalSeq, r0, r1, c0, c1, top, left,
+                                        scoreOnly)
+        region = horizontalSeq[c0:c1].encode('latin-1')
+        vertical = verticalSeq[r0:r1].encode('latin-1')
+        fromArray = None if scoreOnly else DirectionTable(r1 - r0, c1 - c0)
+        cost = list(top)
+        rightColumn = [cost[-1]]
+        for i in range(r0 + 1, r1 + 1):
+            prev = cost
+            verticalBase = vertical[i - r0 - 1]
+            leftCost = left[i - r0]
+            cost = [leftCost]
+            directions = []
+            for horizontalBase, diagonalCost, aboveCost in zip(region, prev, prev[1:]):
+                diagonalCost += MATCH if horizontalBase == verticalBase else SUB
+                aboveCost += INDEL
+                leftCost += INDEL
+                if diagonalCost <= leftCost and diagonalCost <= aboveCost:
+                    leftCost = diagonalCost
+                    directions.append(FROM_DIAGONAL)
+                elif aboveCost <= leftCost:
+                    leftCost = aboveCost
+                    directions.append(FROM_ABOVE)
+                else:
+                    directions.append(FROM_LEFT)
+                cost.append(leftCost)
+            if fromArray is not None:
+                fromArray.setRow(i - r0 - 1, directions)
+            rightColumn.append(cost[-1])
+        return cost, rightColumn, fromArray
+
+    def fillRegionNumpy(self, horizontalSeq, verticalSeq, r0, r1, c0, c1, top, left, scoreOnly):
+        horizontal = self.encodeSequence(horizontalSeq, c1, 0)
+        vertical = self.encodeSequence(verticalSeq, r1, 1)
+        cost = np.asarray(top, dtype=float)
+        rightColumn = [cost[-1]]
+        pointerRows = []
+        for i in range(r0 + 1, r1 + 1):
+            cost, pointers = self.alignmentRow(cost, left[i - r0], horizontal[c0 + 1:c1 + 1],
+                                               vertical[i])
+            if not scoreOnly:
+                pointerRows.append(pointers)
+            rightColumn.append(cost[-1])
+        fromArray = None
+        if not scoreOnly:
+            fromArray = DirectionTable.fromCodes(
+                np.array(pointerRows, dtype=np.uint8).reshape(r1 - r0, c1 - c0))
+        return cost, rightColumn, fromArray
+    '''
+        unrestrictedAlignment that starts from a Checkpoint of the same pair at a shorter
+        align_length. The old n x m block of the table is unchanged, so only the strip to
+        its right (from the checkpoint's last column) and the strip below it (from its last
+        row) are filled. The alignment follows the pointers of the strips and then of the
+        checkpoint. Without a checkpoint (or one with no pointers when the alignment is
+        wanted) it starts from the empty table. Returns the score, the Traceback that
+        builds the alignments (None with scoreOnly) and the checkpoint of this run.
+        N and M are the new prefix lengths, n and m the checkpoint's
+        Time:
+            O(NM - nm) for the new cells, plus O(N + M) for the traceback
+        Space:
+            O(NM) for the pointers, old and new, O(N + M) with scoreOnly
+    '''
+
+    def extendUnrestricted(self, horizontalSeq, verticalSeq, align_length, checkpoint=None,
+                           engine='python', scoreOnly=False):
+        cols = min(align_length, len(horizontalSeq))
+        rows = min(align_length, len(verticalSeq))
+        if checkpoint is None or (checkpoint.directions is None and not scoreOnly):
+            checkpoint = Checkpoint(0, 0, [0], [0], None if scoreOnly else DirectionTable(1, 1))
+        n, m = checkpoint.n, checkpoint.m
+        top = [j * INDEL for j in range(m, cols + 1)]
+        rightRow, rightColumn, right = self.fillRegion(
+            horizontalSeq, verticalSeq, 0, n, m, cols, top, checkpoint.column, engine, scoreOnly)
+        top = list(checkpoint.row) + list(rightRow[1:])
+        left = [i * INDEL for i in range(n, rows + 1)]
+        bottomRow, bottomColumn, bottom = self.fillRegion(
+            horizontalSeq, verticalSeq, n, rows, 0, cols, top, left, engine, scoreOnly)
+        directions = None
+        if not scoreOnly:
+            directions = StitchedDirections(checkpoint.directions, right, bottom, rows + 1, cols + 1)
+        extended = Checkpoint(rows, cols, bottomRow, list(rightColumn) + list(bottomColumn[1:]),
+                              directions)
+        if (n, m) == (rows, cols) and checkpoint.directions is not None:
+            # the same table, keep the checkpoint rather than one wrapping it
+            extended = checkpoint
+        score = int(bottomRow[-1])
+        if scoreOnly:
+            return score, None, extended
+        return score, Traceback(directions, self.generateAlignment, horizontalSeq, verticalSeq,
+                                directions, align_length), extended
+    '''
+        bandedAlignment that starts from a Checkpoint of the same pair at a shorter
+        align_length: the band rows up to the checkpoint's row are unchanged, so it carries
+        on from there. The new checkpoint is the last row that is complete, the band rows
+        after it reach past the end of the horizontal prefix and would change at a longer
+        align_length. Returns the same as extendUnrestricted.
+        Time:
+            O(k(N - n)) for the new rows, plus O(N) for the traceback
+        Space:
+            O(kN) for the pointers, O(k) with scoreOnly
+    '''
+
+    def extendBanded(self, horizontalSeq, verticalSeq, align_length, checkpoint=None,
+                     scoreOnly=False, maxIndels=MAXINDELS):
+        maxJ = min(align_length, len(horizontalSeq))
+        cols = min((align_length + 1), len(horizontalSeq) + 1)
+        rows = min((align_length + 1), len(verticalSeq) + 1)
+        if abs(cols - rows) > maxIndels:
+            if scoreOnly:
+                return float('inf'), None, None
+            return float('inf'), Traceback(None, lambda: ("No Alignment Possible",
+                                                          "No Alignment Possible")), None
+        retJ = cols - rows + maxIndels + 1
+        cols = 2*maxIndels + 1
+        horizontal = horizontalSeq[:maxJ].encode('latin-1')
+        vertical = verticalSeq[:rows - 1].encode('latin-1')
+        keepRow = min(rows - 1, maxJ - maxIndels)
+        if checkpoint is None or (checkpoint.directions is None and not scoreOnly):
+            startRow = 0
+            cost = [float('inf')] * (cols + 1)
+            cost[maxIndels] = 0
+        else:
+            startRow = checkpoint.n + 1
+            cost = checkpoint.row
+        fromArray = None if scoreOnly else DirectionTable(rows - startRow, cols)
+        cost, kept = self.fillBandRows(horizontal, vertical, maxJ, startRow, rows, cost,
+                                       fromArray, maxIndels, keepRow)
+        directions = keptDirections = None
+        if fromArray is not None:
+            old = checkpoint.directions if startRow > 0 else None
+            directions = BandDirections(old, fromArray, startRow, rows)
+            keptDirections = BandDirections(old, fromArray, startRow, keepRow + 1)
+        extended = checkpoint if startRow > 0 else None
+        if kept is not None:
+            extended = Checkpoint(keepRow, None, kept, None, keptDirections)
+        score = cost[retJ - 1]
+        if scoreOnly:
+            return score, None, extended
+        return score, Traceback(directions, self.generateBandedAlignment, horizontalSeq,
+                                verticalSeq, directions, align_length, retJ, maxIndels), extended
+    '''
+        Looks up the banded and unrestricted alignment functions for an engine name.
+        With scoreOnly it returns the functions that only compute the cost. A band
+        row is only 2*MAXINDELS + 1 cells, too short for numpy to beat the plain
+        loop, so both engines share bandedScore.
+        Time:
+            O(1)
+        Space:
+            O(1)
+    '''
+
+    def getEngine(self, engine, scoreOnly=False):
+        if engine == 'python':
+            if scoreOnly:
+                return self.bandedScore, self.unrestrictedScore
+            return self.bandedAlignment, self.unrestrictedAlignment
+        if engine in ('numpy', 'batch'):
+            if np is None:
+                raise ImportError("the {} engine requires numpy to be installed".format(engine))
+            if scoreOnly:
+                return self.bandedScore, self.unrestrictedScoreNumpy
+            return self.bandedAlignmentNumpy, self.unrestrictedAlignmentNumpy
+        raise ValueError("Unknown engine {!r}, expected one of {}".format(
+            engine, ", ".join(ENGINES)))
+    '''
+        Aligns sequence i against sequence j (i < j) with the given strategy and returns
+        score, alignment of i, alignment of j. The banded version is always given j as
+        the horizontal sequence. Strategies that have more to report about the pair
+        (the adaptive bandwidth) put it in details when it is given.
+        cutoff is passed on to the python engine's unrestricted and banded alignments,
+        a pair proven to cost more comes back as (lower bound, None, None)
+        Time and space:
+            see the function the strategy picks
+    '''
+
+    def alignPair(self, seqI, seqJ, strategy, align_length, engine='python', details=None,
+                  scoring=None, cutoff=None):
+        if scoring is not None:
+            return self.affinePair(seqI, seqJ, strategy, align_length, engine, scoring)
+        bandedAlignment, unrestrictedAlignment = self.getEngine(engine)
+        if cutoff is not None and engine == 'python':
+            bandedAlignment = partial(bandedAlignment, cutoff=cutoff)
+            unrestrictedAlignment = partial(unrestrictedAlignment, cutoff=cutoff)
+        if strategy == 'banded':
+            score, alignmentJ, alignmentI = bandedAlignment(seqJ, seqI, align_length)
+            return score, alignmentI, alignmentJ
+        if strategy == 'hirschberg':
+            return self.hirschbergAlignment(seqI, seqJ, align_length)
+        if strategy == 'adaptive':
+            return self.adaptiveBandedAlignment(seqI, seqJ, align_length, engine, details)
+        if strategy == 'seeded':
+            return self.seededAlignment(seqI, seqJ, align_length, engine, details)
+        return unrestrictedAlignment(seqI, seqJ, align_length)
+    '''
+        Same as alignPair but only returns the score, without any traceback. With cutoff
+        a score above it can be the lower bound the python engine stopped at.
+        Time:
+            see the function the strategy picks
+        Space:
+            O(m) or O(k) for banded
+    '''
+
+    def scorePair(self, seqI, seqJ, strategy, align_length, engine='python', details=None,
+                  scoring=None, cutoff=None):
+        if scoring is not None:
+            return self.affinePair(seqI, seqJ, strategy, align_length, engine, scoring,
+                                   scoreOnly=True)
+        bandedScore, unrestrictedScore = self.getEngine(engine, scoreOnly=True)
+        if cutoff is not None and engine == 'python':
+            bandedScore = partial(bandedScore, cutoff=cutoff)
+            unrestrictedScore = partial(unrestrictedScore, cutoff=cutoff)
+        if strategy == 'banded':
+            return bandedScore(seqJ, seqI, align_length)
+        if strategy == 'adaptive':
+            return self.adaptiveBandedAlignment(seqI, seqJ, align_length, engine, details,
+                                                scoreOnly=True)
+        if strategy == 'seeded':
+            # the gaps are small, tracing them back costs little next to finding the seeds
+            return self.seededAlignment(seqI, seqJ, align_length, engine, details)[0]
+        return unrestrictedScore(seqI, seqJ, align_length)
+    '''
+        alignPair and scorePair with the affine gap costs of scoring, for the unrestricted
+        and banded strategies
+        Time and space:
+            see affineAlignment and affineBandedAlignment
+    '''
+
+    def affinePair(self, seqI, seqJ, strategy, align_length, engine, scoring, scoreOnly=False):
+        if strategy == 'banded':
+            result = self.affineBandedAlignment(seqJ, seqI, align_length, scoring, engine,
+                                                scoreOnly)
+            return result if scoreOnly else (result[0], result[2], result[1])
+        if strategy == 'unrestricted':
+            return self.affineAlignment(seqI, seqJ, align_length, scoring, engine, scoreOnly)
+        raise ValueError("Affine gap scoring only works with the unrestricted and banded "
+                         "strategies, not {!r}".format(strategy))
+    '''
+        Everything align does for one pair i < j: the costLowerBound prefilter when there
+        is a threshold, then scorePair or alignPair (tracePair when there are checkpoints
+        or tracebacks for the strategy). Returns (score, alignment of i,
+        alignment of j, details), the alignments are None for score only and bound only
+        results. With tracebacks the unrestricted and banded strategies don't build the
+        alignments either, the pair's Traceback is in details as 'traceback' instead.
+        scoring (a Scoring) aligns with affine gap costs, checkpoints, tracebacks and the
+        threshold (costLowerBound is a bound on the linear costs only) are only for the
+        linear costs. The threshold is also the cutoff of the python engine's
+        unrestricted and banded fills, pairs found to cost more while they are filled are
+        bound only too (with scoreOnly so is every pair that costs more).
+        Time and space:
+            see costLowerBound, scorePair and alignPair
+    '''
+
+    def solvePair(self, seqI, seqJ, strategy, align_length, engine, scoreOnly, threshold=None,
+                  checkpoints=None, tracebacks=False, scoring=None):
+        if scoring is not None and threshold is not None:
+            raise ValueError("Affine gap scoring only works without a threshold")
+        skipped = self.prefilterPair(seqI, seqJ, align_length, threshold)
+        if skipped is not None:
+            return skipped
+        details = {}
+        if scoring is None and strategy in ('unrestricted', 'banded') and (
+                checkpoints is not None or (tracebacks and not scoreOnly)):
+            score, traceback = self.tracePair(seqI, seqJ, strategy, align_length, engine,
+                                              scoreOnly, checkpoints)
+            if traceback is None:
+                return score, None, None, details
+            if tracebacks:
+                details['traceback'] = traceback
+                return score, None, None, details
+            return (score,) + traceback.alignments() + (details,)
+        cutoff = threshold if engine == 'python' and strategy in ('unrestricted', 'banded') \
+            else None
+        if scoreOnly:
+            score = self.scorePair(seqI, seqJ, strategy, align_length, engine, details, scoring,
+                                   cutoff)
+            if cutoff is not None and cutoff < score < math.inf:
+                return score, None, None, {'bound_only': True}
+            return score, None, None, details
+        score, alignment1, alignment2 = self.alignPair(seqI, seqJ, strategy, align_length, engine,
+                                                       details, scoring, cutoff)
+        if alignment1 is None:
+            return score, None, None, {'bound_only': True}
+        return score, alignment1, alignment2, details
+    '''
+        Fills the unrestricted or banded table of the pair and returns the score and a
+        Traceback giving (alignment of i, alignment of j), None with scoreOnly. With
+        checkpoints (a CheckpointStore) it carries on from the checkpoint of the longest
+        shorter align_length there and stores this run's checkpoint.
+        Time and space:
+            see extendUnrestricted and extendBanded
+    '''
+
+    def tracePair(self, seqI, seqJ, strategy, align_length, engine='python', scoreOnly=False,
+                  checkpoints=None):
+        # the same orientation as alignPair, banded is given j as the horizontal sequence
+        horizontalSeq, verticalSeq = (seqJ, seqI) if strategy == 'banded' else (seqI, seqJ)
+        checkpoint = None
+        if checkpoints is not None:
+            checkpoint = checkpoints.get(horizontalSeq, verticalSeq, strategy, align_length,
+                                         needDirections=not scoreOnly)
+        if strategy == 'banded':
+            score, traceback, extended = self.extendBanded(horizontalSeq, verticalSeq,
+                                                           align_length, checkpoint, scoreOnly)
+        else:
+            score, traceback, extended = self.extendUnrestricted(
+                horizontalSeq, verticalSeq, align_length, checkpoint, engine, scoreOnly)
+        if checkpoints is not None and extended is not None and extended is not checkpoint:
+            checkpoints.put(horizontalSeq, verticalSeq, strategy, align_length, extended)
+        if traceback is not None:
+            traceback.flipped = strategy == 'banded'
+        return score, traceback
+    '''
+        The threshold prefilter of solvePair on its own. Returns the bound only result
+        (bound, None, None, details) when the pair can't cost threshold or less, None when
+        it has to be aligned (or there is no threshold).
+        Time and space:
+            see costLowerBound
+    '''
+
+    def prefilterPair(self, seqI, seqJ, align_length, threshold):
+        if threshold is None:
+            return None
+        bound, distance = self.costLowerBound(seqI, seqJ, align_length)
+        if bound > threshold:
+            return bound, None, None, {'edit_distance': distance, 'bound_only': True}
+        return None
+    '''
+        Times the tracebacks and the threshold prefilter of this object into stats (an
+        AlignmentStats) by shadowing those methods with timed ones, None puts the plain
+        methods back. Nothing else is wrapped, so without stats nothing is slower.
+        Time:
+            O(1)
+        Space:
+            O(1)
+    '''
+
+    def instrument(self, stats):
+        for name, phase in INSTRUMENTED.items():
+            if stats is None:
+                self.__dict__.pop(name, None)
+            else:
+                setattr(self, name, stats.timed(phase, getattr(type(self), name).__get__(self)))
 # This is the method called by the GUI.  _sequences_ is h list of the ten sequences, _table_ is h
 # handle to the GUI so it can be updated as you find results, _banded_ is h boolean that tells
 # you whether you should compute h banded alignment or full alignment, and _align_length_ tells you
 # how many base pairs to use in computing the alignment
     '''
         calls either bandedAlignment or unrestrictedAlignment
+        engine picks the implementation, 'python' (cell by cell) or 'numpy' (vectorized),
+        both give the same scores and alignments
+        strategy overrides banded, 'hirschberg' gives the unrestricted result in linear space
+        and 'adaptive' gives it by widening the band until it is provably exact, the final
+        bandwidth of each pair is in its result as 'bandwidth'. 'seeded' is seededAlignment,
+        near linear time for whole genomes but only close to optimal, each pair's result
+        has its 'anchors' and 'anchored_bases'
+        with scoreOnly only the costs are computed and each pair's alignment is run the
+        first time it is read from the results (see LazyAlignment)
         k is bandwidth
         n and m are lengths of the strings
         a is align_length
@@ -258,50 +2036,355 @@ class GeneSequencing:
                 O(kn) --> avg large n's O(ka)
             else:
                 O(nm) --> avg large n and m O(a^2)
+            scoreOnly keeps the time but space drops to O(k) or O(m) per pair
+        workers > 1 runs the pairs on that many processes, longest first, and fills the
+        results and table as each one finishes. The results are the same as the serial run.
+        engine='batch' with the banded strategy aligns the pairs together in one process
+        with bandedAlignmentBatch instead (workers is not used), again with the same results
+        table can be None when there is no GUI to update, progress(i, j, score) is called
+        as each pair (including i == j) is done
+        cache (an AlignmentCache) is checked before aligning a pair and given every new result
+        cancelled() is checked between pairs, once it returns True align stops and returns
+        the results so far (pairs that weren't aligned are left as {})
+        the pairs are run by alignStream, align only collects its records
+        threshold skips the alignment of any pair whose costLowerBound is above it, those
+        pairs get {'align_cost': bound, 'edit_distance': d, 'bound_only': True}. The python
+        engine's unrestricted and banded fills also stop once they prove a pair costs more,
+        those get {'align_cost': bound, 'bound_only': True}
+        checkpoints (a CheckpointStore) lets the unrestricted and banded strategies carry on
+        from an earlier run of the same pairs at a shorter align_length and keeps this run's
+        DP frontiers for the next one. Only the serial path (no workers, not 'batch') uses it.
+        tracebacks (a TracebackStore) makes the unrestricted and banded pairs of the serial
+        path LazyAlignment records too, holding their pointers instead of the alignment
+        strings until they are read, as many as fit in the store's memory budget. A cache
+        then only gets their scores.
+        scoring (a Scoring) switches the unrestricted and banded strategies to the affine
+        gap costs of affineAlignment and affineBandedAlignment. costLowerBound assumes the
+        linear costs so it can't be combined with threshold, and the 'batch' engine runs
+        the pairs one at a time with numpy.
+        stats (an AlignmentStats) gets the time and cells of every pair and the time of the
+        tracebacks, prefilter, cache, table and progress calls (see instrument). Pool
+        workers only report each pair's time. Without it nothing is timed.
         see other functions for explanation
     '''
 
-    def align(self, sequences, table, banded, align_length):
-        self.banded = banded
+    def align(self, sequences, table, banded, align_length, engine='python', strategy=None,
+              scoreOnly=False, workers=None, progress=None, cache=None, cancelled=None,
+              threshold=None, checkpoints=None, tracebacks=None, scoring=None, stats=None):
+        stream = self.alignStream(sequences, banded, align_length, engine, strategy, scoreOnly,
+                                  workers, cache, threshold, checkpoints, tracebacks, scoring,
+                                  stats)
+        results = [[{} for j in range(len(sequences))] for i in range(len(sequences))]
+
+        def setCell(i, j, text):
+            table.item(i, j).setText(text)
+            table.repaint()
+
+        if stats is not None:
+            setCell = stats.timed('table', setCell)
+            if progress is not None:
+                progress = stats.timed('progress', progress)
+        if cancelled is not None and cancelled():
+            stream.close()
+        for i, j, score, result in stream:
+            results[i][j] = result
+            if table is not None:
+                setCell(i, j, '{}{}'.format('>' if result.get('bound_only') else '',
+                                            int(score) if score != math.inf else score))
+            if progress is not None:
+                progress(i, j, score)
+            if cancelled is not None and cancelled():
+                # pairs already running finish, the rest never start
+                stream.close()
+                break
+        return results
+    '''
+        The pairs of align as a generator: yields (i, j, score, result) for every i <= j as
+        it is done, result being what align puts in results[i][j]. Nothing is aligned until
+        the next record is asked for, so a slow consumer holds the run back and only the
+        records it keeps stay in memory. With workers at most maxPending pairs (two per
+        worker by default) are on the pool at once, picked longest first from the next
+        POOL_ORDER_WINDOW*maxPending pairs, 'batch' aligns BATCH_LANES pairs ahead. Closing
+        the generator stops the run (pairs already running on the pool finish and are
+        dropped) and commits the cache and checkpoints, as does the end. The serial path
+        yields the pairs row by row, the others yield every i == j first and then the pairs
+        as they finish. Arguments are those of align, which fails here on bad ones, before
+        the first record.
+        Time:
+            same as align
+        Space:
+            O(1) records, besides the alignment tables of the pairs being aligned
+    '''
+
+    def alignStream(self, sequences, banded, align_length, engine='python', strategy=None,
+                    scoreOnly=False, workers=None, cache=None, threshold=None, checkpoints=None,
+                    tracebacks=None, scoring=None, stats=None, maxPending=None):
+        if strategy is None:
+            strategy = 'banded' if banded else 'unrestricted'
+        if strategy not in STRATEGIES:
+            raise ValueError("Unknown strategy {!r}, expected one of {}".format(
+                strategy, ", ".join(STRATEGIES)))
+        if scoring is not None and (threshold is not None or
+                                    strategy not in ('unrestricted', 'banded')):
+            raise ValueError("Affine gap scoring only works with the unrestricted and banded "
+                             "strategies and without a threshold")
+        # results with other costs are cached apart
+        cacheStrategy = strategy if scoring is None else '{} {!r}'.format(strategy, scoring)
+        self.banded = strategy == 'banded'
         self.MaxCharactersToAlign = align_length
-        results = []
+        # fail before any work on an unknown or missing engine
+        self.getEngine(engine, scoreOnly)
+        if maxPending is None and workers is not None:
+            maxPending = 2 * workers
+
+        def solve(i, j):
+            return self.solvePair(sequences[i], sequences[j], strategy, align_length, engine,
+                                  scoreOnly, threshold, checkpoints, tracebacks is not None,
+                                  scoring)
+
+        cacheGet = cache.get if cache is not None else None
+        cachePut = cache.put if cache is not None else None
+        if stats is not None:
+            if cache is not None:
+                cacheGet = stats.timed('cache', cacheGet)
+                cachePut = stats.timed('cache', cachePut)
+            untimedSolve = solve
+
+            def solve(i, j):
+                start = time.perf_counter()
+                result = untimedSolve(i, j)
+                # the prefilter fills no cells for the pairs it skips
+                cells = 0 if result[3].get('bound_only') else self.pairCells(
+                    sequences[i], sequences[j], strategy, align_length)
+                stats.pair(i, j, start, time.perf_counter(), cells, result[0])
+                return result
+
+        def record(i, j, score, alignment1, alignment2, details=None):
+            boundOnly = details is not None and details.get('bound_only')
+            traceback = details.pop('traceback', None) if details else None
+            if boundOnly:
+                result = {'align_cost': score}
+            elif alignment1 is None:
+                result = LazyAlignment(score, self.alignPair, sequences[i], sequences[j],
+                                       strategy, align_length, engine, None, scoring,
+                                       traceback=traceback, tracebacks=tracebacks)
+            else:
+                result = {'align_cost': score, 'seqi_first100': alignment1[:100],
+                          'seqj_first100': alignment2[:100]}
+            if details:
+                result.update(details)
+            return i, j, score, result
+
+        def recordComputed(i, j, score, alignment1, alignment2, details):
+            if cache is not None and not details.get('bound_only'):
+                # the traceback is only kept in memory, by tracebacks
+                cachePut(sequences[i], sequences[j], cacheStrategy, align_length,
+                         score, alignment1, alignment2,
+                         {key: value for key, value in details.items() if key != 'traceback'})
+            return record(i, j, score, alignment1, alignment2, details)
 
-        for i in range(len(sequences)):
-            jresults = []
-            for j in range(len(sequences)):
-                if j < i:
-                    s = {}
+        def recordCached(i, j):
+            if cache is None:
+                return None
+            entry = cacheGet(sequences[i], sequences[j], cacheStrategy, align_length,
+                             needAlignment=not scoreOnly and tracebacks is None)
+            if entry is None:
+                return None
+            return record(i, j, *entry)
+
+        def recordSame(i):
+            legnth = min((align_length + 1), len(sequences[i]) + 1)
+            match = MATCH if scoring is None else scoring.match
+            return record(i, i, match * (legnth-1), sequences[i], sequences[i])
+
+        def pairs():
+            return ((i, j) for i in range(len(sequences)) for j in range(i + 1, len(sequences)))
+
+        def alignBatch(batch):
+            # the banded version is always given j as the horizontal sequence
+            start = time.perf_counter()
+            batchResults = self.bandedAlignmentBatch(
+                [(sequences[j], sequences[i]) for i, j in batch], align_length,
+                scoreOnly=scoreOnly)
+            if stats is not None:
+                stats.batch(start, time.perf_counter(), [
+                    (i, j, self.pairCells(sequences[i], sequences[j], strategy, align_length),
+                     result if scoreOnly else result[0])
+                    for (i, j), result in zip(batch, batchResults)])
+            for (i, j), result in zip(batch, batchResults):
+                if scoreOnly:
+                    yield recordComputed(i, j, result, None, None, {})
+                else:
+                    yield recordComputed(i, j, result[0], result[2], result[1], {})
+
+        def recordFinished(job):
+            result = job.result()
+            if stats is not None:
+                (start, end, pid), result = result[-1], result[:-1]
+                i, j, score, _, _, details = result
+                cells = 0 if details.get('bound_only') else self.pairCells(
+                    sequences[i], sequences[j], strategy, align_length)
+                stats.pair(i, j, start, end, cells, score, pid=pid)
+            return recordComputed(*result)
+
+        def longestFirst():
+            # the longest jobs of a window of the pairs first, so no worker is left with a
+            # big pair at the end without sorting them all up front
+            window = []
+            for i, j in pairs():
+                heappush(window, (-self.pairCells(sequences[i], sequences[j], strategy,
+                                                  align_length), i, j))
+                if len(window) >= POOL_ORDER_WINDOW * maxPending:
+                    yield heappop(window)[1:]
+            while window:
+                yield heappop(window)[1:]
+
+        def alignOnPool():
+            pending = set()
+            with ProcessPoolExecutor(max_workers=workers, initializer=startPoolWorker,
+                                     initargs=(sequences,)) as pool:
+                try:
+                    for i, j in longestFirst():
+                        cached = recordCached(i, j)
+                        if cached is not None:
+                            yield cached
+                            continue
+                        pending.add(pool.submit(alignPoolJob, i, j, strategy, align_length,
+                                                engine, scoreOnly, threshold, scoring,
+                                                stats is not None))
+                        while len(pending) >= maxPending:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for job in done:
+                                yield recordFinished(job)
+                    for job in as_completed(pending):
+                        yield recordFinished(job)
+                finally:
+                    for job in pending:
+                        job.cancel()
+
+        def records():
+            # also takes off the timing left by a run that raised
+            self.instrument(stats)
+            if stats is not None:
+                stats.begin()
+            try:
+                if engine == 'batch' and strategy == 'banded' and scoring is None:
+                    for i in range(len(sequences)):
+                        yield recordSame(i)
+                    batch = []
+                    for i, j in pairs():
+                        cached = recordCached(i, j)
+                        if cached is not None:
+                            yield cached
+                            continue
+                        skipped = self.prefilterPair(sequences[i], sequences[j], align_length,
+                                                     threshold)
+                        if skipped is not None:
+                            yield recordComputed(i, j, *skipped)
+                            continue
+                        batch.append((i, j))
+                        if len(batch) == BATCH_LANES:
+                            yield from alignBatch(batch)
+                            batch = []
+                    yield from alignBatch(batch)
+                elif workers is None or workers <= 1:
+                    for i, j in ((i, j) for i in range(len(sequences))
+                                 for j in range(i, len(sequences))):
+                        if i == j:
+                            yield recordSame(i)
+                            continue
+                        cached = recordCached(i, j)
+                        yield cached if cached is not None else recordComputed(i, j, *solve(i, j))
                 else:
-                    ###################################################################################################
-                    # your code should replace these three statements and populate the three variables: score, alignment1 and alignment2
-                    if i == j:
-                        legnth = min((align_length + 1),
-                                     len(sequences[i]) + 1)
-                        score, alignment1, alignment2 = MATCH * \
-                            (legnth-1), sequences[i], sequences[j]
-                    elif banded:
-                        if len(alignment1) > len(alignment2):
-                            score, alignment1, alignment2 = self.bandedAlignment(
-                                sequences[i], sequences[j], align_length)
-                        else:
-                            score, alignment2, alignment1 = self.bandedAlignment(
-                                sequences[j], sequences[i], align_length)
-                    else:
-                        score, alignment1, alignment2 = self.unrestrictedAlignment(
-                            sequences[i], sequences[j], align_length)
-                    # if i == 2 and j == 9:
-                    #     print("3", alignment1[:100])
-                    #     print("10", alignment2[:100])
-                    # alignment1 = 'abc-easy  DEBUG:(seq{}, {} chars,align_len={}{})'.format(i+1,
-                    #                                                                        len(sequences[i]), align_length, ',BANDED' if banded else '')
-                    # alignment2 = 'as-123--  DEBUG:(seq{}, {} chars,align_len={}{})'.format(j+1,
-                    #                                                                        len(sequences[j]), align_length, ',BANDED' if banded else '')
-###################################################################################################
-                    s = {'align_cost': score, 'seqi_first100': alignment1[:100],
-                         'seqj_first100': alignment2[:100]}
-                    table.item(i, j).setText('{}'.format(
-                        int(score) if score != math.inf else score))
-                    table.repaint()
-                jresults.append(s)
-            results.append(jresults)
+                    for i in range(len(sequences)):
+                        yield recordSame(i)
+                    yield from alignOnPool()
+            finally:
+                if stats is not None:
+                    self.instrument(None)
+                    stats.end()
+                if cache is not None:
+                    cache.commit()
+                if checkpoints is not None:
+                    checkpoints.commit()
+
+        return records()
+    '''
+        Aligns one new sequence against only the candidates (indices into sequences), for
+        example the top matches from a SketchIndex query, instead of against everything.
+        Returns {candidate: result} with the same results as align, query being i.
+        Time and space:
+            c times one pair of align, c is the number of candidates
+    '''
+
+    def alignQuery(self, query, sequences, candidates, align_length, banded=False,
+                   engine='python', strategy=None, scoreOnly=False, threshold=None, scoring=None):
+        if strategy is None:
+            strategy = 'banded' if banded else 'unrestricted'
+        if strategy not in STRATEGIES:
+            raise ValueError("Unknown strategy {!r}, expected one of {}".format(
+                strategy, ", ".join(STRATEGIES)))
+        results = {}
+        for j in candidates:
+            score, alignment1, alignment2, details = self.solvePair(
+                query, sequences[j], strategy, align_length, engine, scoreOnly, threshold,
+                scoring=scoring)
+            if details.get('bound_only'):
+                results[j] = {'align_cost': score}
+            elif alignment1 is None:
+                results[j] = LazyAlignment(score, self.alignPair, query, sequences[j],
+                                           strategy, align_length, engine, None, scoring)
+            else:
+                results[j] = {'align_cost': score, 'seqi_first100': alignment1[:100],
+                              'seqj_first100': alignment2[:100]}
+            results[j].update(details)
         return results
+    '''
+        Estimates how many DP cells aligning the pair takes, used to order the jobs
+        Time:
+            O(1)
+        Space:
+            O(1)
+    '''
+
+    def pairCells(self, seqI, seqJ, strategy, align_length):
+        n = min(align_length, len(seqI))
+        m = min(align_length, len(seqJ))
+        if strategy == 'banded':
+            return (2*MAXINDELS + 1) * max(n, m)
+        if strategy == 'adaptive':
+            # only the first band, the doublings depend on how far apart the pair is
+            return (2*max(MAXINDELS, abs(n - m)) + 1) * max(n, m)
+        if strategy == 'seeded':
+            # the seeding, the gaps depend on how far apart the pair is
+            return n + m
+        return n * m
+
+
+# Each process of the pool used by align(workers=...) gets the sequences once when it
+# starts instead of with every pair
+poolSequences = None
+poolSolver = None
+
+
+def startPoolWorker(sequences):
+    global poolSequences, poolSolver
+    poolSequences = sequences
+    poolSolver = GeneSequencing()
+
+
+def alignPoolJob(i, j, strategy, align_length, engine, scoreOnly, threshold, scoring=None,
+                 timed=False):
+    start = time.perf_counter()
+    score, alignment1, alignment2, details = poolSolver.solvePair(
+        poolSequences[i], poolSequences[j], strategy, align_length, engine, scoreOnly, threshold,
+        scoring=scoring)
+    if alignment1 is not None:
+        # only the first 100 characters are kept by align, no need to send the rest back
+        alignment1, alignment2 = alignment1[:100], alignment2[:100]
+    if timed:
+        # perf_counter is the same clock in every process on Linux, so align can put this
+        # span on its own timeline
+        return i, j, score, alignment1, alignment2, details, \
+            (start, time.perf_counter(), os.getpid())
+    return i, j, score, alignment1, alignment2, details
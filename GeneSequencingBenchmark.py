@@ -0,0 +1,553 @@
+#!/usr/bin/python3
+
+# Benchmarks for the alignment functions in GeneSequencing.py
+#
+#   python GeneSequencingBenchmark.py hirschberg --lengths 500 1000 2000
+#   python GeneSequencingBenchmark.py parallel --workers 1 2 4 8
+#   python GeneSequencingBenchmark.py sketch --families 100 --members 10
+#   python GeneSequencingBenchmark.py batch --pairs 45 1000 --length 3000
+#   python GeneSequencingBenchmark.py affine --lengths 500 1000 3000 --gap-open 8 --gap-extend 2
+#   python GeneSequencingBenchmark.py seeded --lengths 3000 10000 full
+#   python GeneSequencingBenchmark.py sweep -o before.json
+#   python GeneSequencingBenchmark.py compare before.json after.json
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from GeneSequencing import *
+from SequenceFile import SequenceIndex
+from SketchIndex import SketchIndex, KMER, SKETCH_SIZE
+
+# Pairs of genomes.txt the sweep runs on, by index: two bovine coronaviruses that are
+# nearly the same and a bovine against a murine one
+GENOME_PAIRS = {'genomes-close': (2, 3), 'genomes-distant': (2, 6)}
+
+
+'''
+    Makes a random sequence and a copy of it with roughly rate substitutions and indels
+    so the pair looks like two related genomes. The same seed always gives the same pair.
+'''
+
+
+def makeSequencePair(length, rate=0.05, seed=0):
+    rng = random.Random(seed)
+    original = "".join(rng.choice('acgt') for _ in range(length))
+    return original, mutateSequence(original, rate, rng)
+
+
+def mutateSequence(original, rate, rng):
+    mutated = []
+    for base in original:
+        roll = rng.random()
+        if roll < rate / 3:
+            continue
+        elif roll < 2 * rate / 3:
+            mutated.append(rng.choice('acgt'))
+        elif roll < rate:
+            mutated.append(base)
+            mutated.append(rng.choice('acgt'))
+        else:
+            mutated.append(base)
+    return "".join(mutated)
+
+
+'''
+    Makes count related sequences, each a mutated copy of one random ancestor
+'''
+
+
+def makeSequenceFamily(count, length, rate=0.05, seed=0):
+    rng = random.Random(seed)
+    ancestor = "".join(rng.choice('acgt') for _ in range(length))
+    return [mutateSequence(ancestor, rate, rng) for _ in range(count)]
+
+
+'''
+    Runs function(*args) once and returns its result, the wall time in seconds and the
+    peak number of bytes allocated by Python (and numpy) while it ran
+'''
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+'''
+    Memory vs time of hirschbergAlignment against the full table unrestrictedAlignment.
+    The cell by cell python table is only run up to pythonLimit as it gets very slow.
+'''
+
+
+def benchHirschberg(lengths, pythonLimit):
+    solver = GeneSequencing()
+    functions = [('hirschberg', solver.hirschbergAlignment)]
+    if np is not None:
+        functions.insert(0, ('unrestricted numpy', solver.unrestrictedAlignmentNumpy))
+    functions.insert(0, ('unrestricted python', solver.unrestrictedAlignment))
+    print('{:>8}  {:<20} {:>10} {:>12}'.format('length', 'function', 'seconds', 'peak MB'))
+    for length in lengths:
+        horizontalSeq, verticalSeq = makeSequencePair(length, seed=length)
+        expected = None
+        for name, function in functions:
+            if name == 'unrestricted python' and length > pythonLimit:
+                continue
+            result, seconds, peak = measure(function, horizontalSeq, verticalSeq, length)
+            if expected is None:
+                expected = result
+            elif result != expected:
+                raise AssertionError('{} disagrees at length {}'.format(name, length))
+            print('{:>8}  {:<20} {:>10.3f} {:>12.2f}'.format(
+                length, name, seconds, peak / 1e6))
+
+
+'''
+    Scaling of align(workers=...) on the all pairs run. Every worker count must give
+    the same results as the serial run.
+'''
+
+
+def benchParallel(workerCounts, count, length, banded, engine):
+    solver = GeneSequencing()
+    sequences = makeSequenceFamily(count, length)
+    print('{} sequences of ~{} bases, {} cores available'.format(count, length, os.cpu_count()))
+    print('{:>8} {:>10} {:>9}'.format('workers', 'seconds', 'speedup'))
+    serial = None
+    for workers in workerCounts:
+        start = time.perf_counter()
+        results = solver.align(sequences, None, banded, length, engine=engine, workers=workers)
+        seconds = time.perf_counter() - start
+        if serial is None:
+            serial = (results, seconds)
+        elif results != serial[0]:
+            raise AssertionError('{} workers disagree with {}'.format(workers, workerCounts[0]))
+        print('{:>8} {:>10.3f} {:>8.2f}x'.format(workers, seconds, serial[1] / seconds))
+
+
+'''
+    Throughput of building, saving, loading and querying a SketchIndex over families
+    of related sequences. Each query is a fresh mutated copy of a family's ancestor, and
+    recall is how often its top match belongs to that family.
+'''
+
+
+def benchSketch(families, members, length, queries, topK, k, sketchSize):
+    rng = random.Random(0)
+    sequences = []
+    family = []
+    ancestors = []
+    for f in range(families):
+        ancestor = "".join(rng.choice('acgt') for _ in range(length))
+        ancestors.append(ancestor)
+        for _ in range(members):
+            sequences.append(mutateSequence(ancestor, 0.05, rng))
+            family.append(f)
+    bases = sum(len(seq) for seq in sequences)
+    print('{} sequences of ~{} bases in {} families, k={} sketch size {}'.format(
+        len(sequences), length, families, k, sketchSize))
+
+    start = time.perf_counter()
+    index = SketchIndex.fromSequences(sequences, k=k, sketchSize=sketchSize)
+    seconds = time.perf_counter() - start
+    print('index   {:>10.3f} s  {:>10.1f} sequences/s  {:>8.2f} Mbases/s'.format(
+        seconds, len(sequences) / seconds, bases / seconds / 1e6))
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'bench.sketch')
+        start = time.perf_counter()
+        index.save(filename)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = SketchIndex.load(filename)
+        seconds = time.perf_counter() - start
+        print('save    {:>10.3f} s  {:>10.2f} MB'.format(saved, os.path.getsize(filename) / 1e6))
+        print('load    {:>10.3f} s'.format(seconds))
+    if loaded.sketches != index.sketches:
+        raise AssertionError('loaded sketches differ from the saved ones')
+
+    queryFamilies = [rng.randrange(families) for _ in range(queries)]
+    querySequences = [mutateSequence(ancestors[f], 0.05, rng) for f in queryFamilies]
+    found = 0
+    start = time.perf_counter()
+    for f, query in zip(queryFamilies, querySequences):
+        matches = index.query(query, topK)
+        if matches and family[matches[0][0]] == f:
+            found += 1
+    seconds = time.perf_counter() - start
+    print('query   {:>10.3f} s  {:>10.1f} queries/s   top match recall {:.1%}'.format(
+        seconds, queries / seconds, found / queries))
+
+
+'''
+    bandedAlignment one pair at a time against bandedAlignmentBatch on the same pairs.
+    The batch has to give exactly the same results.
+'''
+
+
+def benchBatch(pairCounts, length, scoreOnly):
+    solver = GeneSequencing()
+    print('{:>8} {:>12} {:>12} {:>9}'.format('pairs', 'scalar s', 'batch s', 'speedup'))
+    for count in pairCounts:
+        pairs = [makeSequencePair(length, seed=seed) for seed in range(count)]
+        start = time.perf_counter()
+        if scoreOnly:
+            expected = [solver.bandedScore(h, v, length) for h, v in pairs]
+        else:
+            expected = [solver.bandedAlignment(h, v, length) for h, v in pairs]
+        scalar = time.perf_counter() - start
+        start = time.perf_counter()
+        results = solver.bandedAlignmentBatch(pairs, length, scoreOnly=scoreOnly)
+        batch = time.perf_counter() - start
+        if results != expected:
+            raise AssertionError('batch disagrees with bandedAlignment at {} pairs'.format(count))
+        print('{:>8} {:>12.3f} {:>12.3f} {:>8.2f}x'.format(count, scalar, batch, scalar / batch))
+
+
+'''
+    Throughput of the affine gap alignments against the linear ones they replace. The
+    affine ones are run twice, with gapOpen == gapExtend == INDEL where they have to
+    give the linear results, and with the given gap costs where both engines have to
+    agree. Cells are the table (or band) cells filled, each one three costs for affine.
+'''
+
+
+def benchAffine(lengths, pythonLimit, gapOpen, gapExtend):
+    solver = GeneSequencing()
+    engines = ['python'] + (['numpy'] if np is not None else [])
+    linear = Scoring()
+    scoring = Scoring(gapOpen=gapOpen, gapExtend=gapExtend)
+    print('{!r}'.format(scoring))
+    print('{:>8}  {:<14} {:<8} {:<20} {:>10} {:>12}'.format(
+        'length', 'table', 'engine', 'costs', 'seconds', 'Mcells/s'))
+    for length in lengths:
+        # longer than length so both prefixes are length and the band reaches the end
+        horizontalSeq, verticalSeq = makeSequencePair(length + length // 10, seed=length)
+        for table in ('unrestricted', 'banded'):
+            if table == 'banded':
+                cells = (2*MAXINDELS + 1) * (length + 1)
+                functions = {'python': solver.bandedAlignment,
+                             'numpy': solver.bandedAlignmentNumpy}
+                affine = solver.affineBandedAlignment
+            else:
+                cells = (length + 1) ** 2
+                functions = {'python': solver.unrestrictedAlignment,
+                             'numpy': solver.unrestrictedAlignmentNumpy}
+                affine = solver.affineAlignment
+            expected = None
+            for engine in engines:
+                if engine == 'python' and table == 'unrestricted' and length > pythonLimit:
+                    continue
+                runs = [('linear', functions[engine], ()),
+                        ('affine, linear', affine, (linear, engine)),
+                        ('affine', affine, (scoring, engine))]
+                for costs, function, extra in runs:
+                    start = time.perf_counter()
+                    result = function(horizontalSeq, verticalSeq, length, *extra)
+                    seconds = time.perf_counter() - start
+                    if costs == 'affine, linear' and result != linearResult:
+                        raise AssertionError('affine with linear costs disagrees at {} {}'.format(
+                            table, length))
+                    if costs == 'linear':
+                        linearResult = result
+                    if costs == 'affine':
+                        if expected is None:
+                            expected = result
+                        elif result != expected:
+                            raise AssertionError('affine engines disagree at {} {}'.format(
+                                table, length))
+                    print('{:>8}  {:<14} {:<8} {:<20} {:>10.3f} {:>12.2f}'.format(
+                        length, table, engine, costs, seconds, cells / seconds / 1e6))
+
+
+'''
+    The pairs the sweep runs on: the GENOME_PAIRS of filename (if it is there) and a
+    synthetic pair with rate mutations, long enough for the longest length
+'''
+
+
+def sweepSources(filename, longest, rate):
+    sources = {}
+    if filename and os.path.exists(filename):
+        with SequenceIndex(filename) as sequences:
+            for name, (i, j) in GENOME_PAIRS.items():
+                if max(i, j) < len(sequences):
+                    sources[name] = (sequences.sequence(i), sequences.sequence(j))
+    longest = max([longest] + [min(len(h), len(v)) for h, v in sources.values()])
+    # a tenth longer so both prefixes are still longest after the indels
+    sources['synthetic'] = makeSequencePair(longest + longest // 10, rate, seed=longest)
+    return sources
+
+
+'''
+    Score and time of seededAlignment against the exact unrestricted optimum on the
+    sweep's pairs, at each length ('full' for the whole sequences). The exact score is
+    only computed (score only, with numpy when it is installed) up to maxCells cells.
+'''
+
+
+def benchSeeded(filename, lengths, engine, maxCells, rate):
+    solver = GeneSequencing()
+    exactScore = solver.unrestrictedScoreNumpy if np is not None else solver.unrestrictedScore
+    numeric = [int(length) for length in lengths if length != 'full']
+    sources = sweepSources(filename, max(numeric + [0]), rate)
+    print('{:<16} {:>7} {:>9} {:>9} {:>7} {:>8} {:>9} {:>9} {:>8}'.format(
+        'pair', 'length', 'seeded', 'exact', 'off', 'off %', 'seconds', 'exact s', 'anchors'))
+    for name, (horizontalSeq, verticalSeq) in sources.items():
+        full = max(len(horizontalSeq), len(verticalSeq))
+        for length in lengths:
+            length = full if length == 'full' else min(int(length), full)
+            details = {}
+            start = time.perf_counter()
+            score = solver.seededAlignment(horizontalSeq, verticalSeq, length, engine,
+                                           details)[0]
+            seconds = time.perf_counter() - start
+            n = min(length, len(verticalSeq))
+            m = min(length, len(horizontalSeq))
+            if n * m > maxCells:
+                print('{:<16} {:>7} {:>9} {:>9} {:>7} {:>8} {:>9.3f} {:>9} {:>8}'.format(
+                    name, length, score, '-', '-', '-', seconds, '-', details['anchors']))
+                continue
+            start = time.perf_counter()
+            exact = exactScore(horizontalSeq, verticalSeq, length)
+            exactSeconds = time.perf_counter() - start
+            print('{:<16} {:>7} {:>9} {:>9} {:>7} {:>8.2f} {:>9.3f} {:>9.3f} {:>8}'.format(
+                name, length, score, exact, score - exact, 100 * (score - exact) / abs(exact),
+                seconds, exactSeconds, details['anchors']))
+
+
+'''
+    Number of DP cells the strategy fills for prefixes of n horizontal and m vertical
+    bases, the band has a row per vertical base
+'''
+
+
+def sweepCells(strategy, n, m, maxIndels):
+    if strategy == 'banded':
+        return (2*maxIndels + 1) * (m + 1)
+    return (n + 1) * (m + 1)
+
+
+'''
+    Times every (source, align_length, strategy, engine, bandwidth) case: the best and
+    median wall time of repeat runs, then one more run under tracemalloc for the peak
+    memory. Lengths can be 'full' for the whole shorter sequence of each pair. Cases over
+    maxCells (pythonMaxCells for the cell by cell engine) are skipped. Banded pairs whose
+    prefixes differ by more than the bandwidth have no alignment and are recorded with a
+    None score. Returns the JSON document written by the sweep command.
+'''
+
+
+def benchSweep(filename, lengths, strategies, engines, bandwidths, repeat, maxCells,
+               pythonMaxCells, rate):
+    solver = GeneSequencing()
+    numeric = [int(length) for length in lengths if length != 'full']
+    sources = sweepSources(filename, max(numeric, default=0), rate)
+    cases = []
+    print('{:<16} {:>7} {:<13} {:<7} {:>4} {:>10} {:>10} {:>10}'.format(
+        'source', 'length', 'strategy', 'engine', 'k', 'seconds', 'Mcells/s', 'peak MB'))
+    for source, (horizontalSeq, verticalSeq) in sources.items():
+        full = min(len(horizontalSeq), len(verticalSeq))
+        for length in lengths:
+            align_length = full if length == 'full' else min(int(length), full)
+            n = min(align_length, len(horizontalSeq))
+            m = min(align_length, len(verticalSeq))
+            for strategy in strategies:
+                for engine in engines:
+                    for maxIndels in (bandwidths if strategy == 'banded' else [None]):
+                        cells = sweepCells(strategy, n, m, maxIndels)
+                        if cells > (pythonMaxCells if engine == 'python' else maxCells):
+                            continue
+                        function = solver.getEngine(engine)[0 if strategy == 'banded' else 1]
+                        args = (horizontalSeq, verticalSeq, align_length)
+                        if strategy == 'banded':
+                            args += (maxIndels,)
+                        times = []
+                        for _ in range(repeat):
+                            start = time.perf_counter()
+                            result = function(*args)
+                            times.append(time.perf_counter() - start)
+                        _, _, peak = measure(function, *args)
+                        score = result[0]
+                        if score == math.inf:
+                            # nothing was filled, there is no alignment in the band
+                            cells = 0
+                        best = min(times)
+                        case = {'source': source, 'align_length': align_length,
+                                'strategy': strategy, 'engine': engine, 'max_indels': maxIndels,
+                                'cells': cells, 'seconds': best,
+                                'median_seconds': statistics.median(times),
+                                'cells_per_second': cells / best if best > 0 else None,
+                                'peak_bytes': peak,
+                                'score': int(score) if score != math.inf else None}
+                        cases.append(case)
+                        print('{:<16} {:>7} {:<13} {:<7} {:>4} {:>10.4f} {:>10.2f} {:>10.2f}'.format(
+                            source, align_length, strategy, engine,
+                            '' if maxIndels is None else 2*maxIndels + 1, best,
+                            cells / best / 1e6 if best > 0 else 0, peak / 1e6))
+    return {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__ if np is not None else None,
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'repeat': repeat, 'cases': cases}
+
+
+def sweepKey(case):
+    return (case['source'], case['align_length'], case['strategy'], case['engine'],
+            case['max_indels'])
+
+
+'''
+    Compares two sweep files case by case on the best wall time. A case more than
+    tolerance slower in the new file is a regression, as is any case whose score
+    changed. Cases under minSeconds in both files are too short to time reliably and
+    are only checked for the score. Returns the number of regressions.
+'''
+
+
+def benchCompare(oldFilename, newFilename, tolerance, minSeconds):
+    with open(oldFilename) as data:
+        old = {sweepKey(case): case for case in json.load(data)['cases']}
+    with open(newFilename) as data:
+        new = {sweepKey(case): case for case in json.load(data)['cases']}
+    regressions = 0
+    print('{:<16} {:>7} {:<13} {:<7} {:>4} {:>10} {:>10} {:>8}'.format(
+        'source', 'length', 'strategy', 'engine', 'k', 'old s', 'new s', 'ratio'))
+    for key in sorted(old.keys() & new.keys(), key=str):
+        before, after = old[key], new[key]
+        ratio = after['seconds'] / before['seconds'] if before['seconds'] > 0 else 1.0
+        flag = ''
+        if after['score'] != before['score']:
+            flag = 'SCORE CHANGED {} -> {}'.format(before['score'], after['score'])
+            regressions += 1
+        elif max(before['seconds'], after['seconds']) < minSeconds:
+            pass
+        elif ratio > 1 + tolerance:
+            flag = 'SLOWER'
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            flag = 'faster'
+        source, length, strategy, engine, maxIndels = key
+        print('{:<16} {:>7} {:<13} {:<7} {:>4} {:>10.4f} {:>10.4f} {:>7.2f}x {}'.format(
+            source, length, strategy, engine, '' if maxIndels is None else 2*maxIndels + 1,
+            before['seconds'], after['seconds'], ratio, flag))
+    for name, missing in (('old', new.keys() - old.keys()), ('new', old.keys() - new.keys())):
+        if missing:
+            print('{} cases only in the other file, not compared (no {} timing)'.format(
+                len(missing), name))
+    print('{} regressions beyond {:.0%}'.format(regressions, tolerance))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the GeneSequencing alignments')
+    commands = parser.add_subparsers(dest='command', required=True)
+    hirschberg = commands.add_parser(
+        'hirschberg', help='memory vs time of the linear space alignment')
+    hirschberg.add_argument('--lengths', type=int, nargs='+', default=[500, 1000, 2000, 4000])
+    hirschberg.add_argument('--python-limit', type=int, default=1000,
+                            help='longest length to run the cell by cell table on')
+    parallel = commands.add_parser('parallel', help='scaling of align() over worker processes')
+    parallel.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()])
+    parallel.add_argument('--sequences', type=int, default=10)
+    parallel.add_argument('--length', type=int, default=1000)
+    parallel.add_argument('--banded', action='store_true')
+    parallel.add_argument('--engine', choices=ENGINES, default='numpy' if np else 'python')
+    sketch = commands.add_parser('sketch', help='throughput of the MinHash sketch index')
+    sketch.add_argument('--families', type=int, default=50)
+    sketch.add_argument('--members', type=int, default=10)
+    sketch.add_argument('--length', type=int, default=30000)
+    sketch.add_argument('--queries', type=int, default=200)
+    sketch.add_argument('--top-k', type=int, default=10)
+    sketch.add_argument('-k', type=int, default=KMER)
+    sketch.add_argument('--sketch-size', type=int, default=SKETCH_SIZE)
+    batch = commands.add_parser('batch', help='banded pairs one at a time vs all together')
+    batch.add_argument('--pairs', type=int, nargs='+', default=[45, 450, 4500])
+    batch.add_argument('--length', type=int, default=3000)
+    batch.add_argument('--score-only', action='store_true')
+    affine = commands.add_parser('affine', help='affine gap engines against the linear ones')
+    affine.add_argument('--lengths', type=int, nargs='+', default=[500, 1000, 3000])
+    affine.add_argument('--python-limit', type=int, default=1000,
+                        help='longest length to run the cell by cell tables on')
+    affine.add_argument('--gap-open', type=int, default=2 * INDEL)
+    affine.add_argument('--gap-extend', type=int, default=1)
+    seeded = commands.add_parser(
+        'seeded', help='seed and extend against the exact optimum, up to the whole genomes')
+    seeded.add_argument('--file', default='genomes.txt',
+                        help='sequence file the genome pairs come from')
+    seeded.add_argument('--lengths', nargs='+', default=['1000', '3000', '10000', 'full'],
+                        help="align_lengths, 'full' for the whole sequences")
+    seeded.add_argument('--engine', choices=('python', 'numpy'),
+                        default='numpy' if np else 'python',
+                        help='engine of the banded alignments of the gaps')
+    seeded.add_argument('--max-cells', type=float, default=1.1e8,
+                        help='longest exact alignment to compare with, in DP cells')
+    seeded.add_argument('--rate', type=float, default=0.05,
+                        help='mutation rate of the synthetic pair')
+    sweep = commands.add_parser(
+        'sweep', help='time the engines over lengths and bandwidths and save it as JSON')
+    sweep.add_argument('--file', default='genomes.txt',
+                       help='sequence file the genome pairs come from')
+    sweep.add_argument('--lengths', nargs='+',
+                       default=['100', '300', '1000', '3000', '10000', 'full'],
+                       help="align_lengths, 'full' for the whole sequences")
+    sweep.add_argument('--strategies', nargs='+', choices=('unrestricted', 'banded'),
+                       default=['unrestricted', 'banded'])
+    sweep.add_argument('--engines', nargs='+', choices=('python', 'numpy'),
+                       default=['python', 'numpy'] if np is not None else ['python'])
+    sweep.add_argument('--max-indels', type=int, nargs='+', default=[MAXINDELS, 10, 30],
+                       help='band half widths for the banded strategy')
+    sweep.add_argument('--repeat', type=int, default=3)
+    sweep.add_argument('--max-cells', type=float, default=2e7,
+                       help='skip cases with more DP cells than this')
+    sweep.add_argument('--python-max-cells', type=float, default=2e6,
+                       help='the same for the cell by cell engine')
+    sweep.add_argument('--rate', type=float, default=0.05,
+                       help='mutation rate of the synthetic pair')
+    sweep.add_argument('-o', '--output', help='JSON file to write the results to')
+    compare = commands.add_parser(
+        'compare', help='flag the cases of one sweep that got slower in another')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--tolerance', type=float, default=0.1,
+                         help='fraction slower that counts as a regression')
+    compare.add_argument('--min-seconds', type=float, default=0.01,
+                         help='cases quicker than this in both runs are not timed')
+    args = parser.parse_args()
+    if args.command == 'hirschberg':
+        benchHirschberg(args.lengths, args.python_limit)
+    elif args.command == 'parallel':
+        benchParallel(args.workers, args.sequences, args.length, args.banded, args.engine)
+    elif args.command == 'batch':
+        benchBatch(args.pairs, args.length, args.score_only)
+    elif args.command == 'affine':
+        benchAffine(args.lengths, args.python_limit, args.gap_open, args.gap_extend)
+    elif args.command == 'seeded':
+        benchSeeded(args.file, args.lengths, args.engine, args.max_cells, args.rate)
+    elif args.command == 'sweep':
+        report = benchSweep(args.file, args.lengths, args.strategies, args.engines,
+                            args.max_indels, args.repeat, args.max_cells, args.python_max_cells,
+                            args.rate)
+        if args.output:
+            with open(args.output, 'w') as out:
+                json.dump(report, out, indent=2)
+                out.write('\n')
+    elif args.command == 'compare':
+        sys.exit(1 if benchCompare(args.old, args.new, args.tolerance, args.min_seconds) else 0)
+    elif args.command == 'sketch':
+        benchSketch(args.families, args.members, args.length, args.queries, args.top_k,
+                    args.k, args.sketch_size)
@@ -0,0 +1,255 @@
+#!/usr/bin/python3
+
+# Command line version of Proj4GUI.py. Runs the all pairs alignment on a sequence file
+# without Qt and writes the results as JSON or TSV.
+#
+#   python GeneSequencingCLI.py genomes.txt --banded --align-length 3000 -o results.tsv
+#   python GeneSequencingCLI.py genomes.txt --query new.txt --top-k 5 -o matches.tsv
+
+import argparse
+import json
+import math
+import sys
+import time
+
+from AlignmentCache import AlignmentCache
+from AlignmentStats import AlignmentStats
+from CheckpointStore import CheckpointStore
+from GeneSequencing import *
+from SequenceFile import loadSequencesFromFile
+from SketchIndex import loadSketchIndex
+
+
+'''
+    One row per pair i <= j with the labels, the cost and (unless scoreOnly) the first
+    100 characters of both alignments. An infinite cost becomes None. The adaptive
+    strategy adds the bandwidth it settled on (None for pairs it didn't compute). With a
+    threshold the pairs the prefilter skipped have bound_only set, their cost is the
+    lower bound and they have no alignments.
+'''
+
+
+def resultRows(seqs, results, scoreOnly, strategy=None, threshold=None):
+    rows = []
+    for i in range(len(results)):
+        for j in range(i, len(results)):
+            result = results[i][j]
+            score = result['align_cost']
+            boundOnly = result.get('bound_only', False)
+            row = {'i': i + 1, 'j': j + 1, 'label_i': seqs[i][1], 'label_j': seqs[j][1],
+                   'align_cost': int(score) if score != math.inf else None}
+            if not scoreOnly:
+                row['seqi_first100'] = None if boundOnly else result['seqi_first100']
+                row['seqj_first100'] = None if boundOnly else result['seqj_first100']
+            if strategy == 'adaptive':
+                row['bandwidth'] = result.get('bandwidth')
+            if threshold is not None:
+                row['bound_only'] = boundOnly
+                row['edit_distance'] = result.get('edit_distance')
+            rows.append(row)
+    return rows
+
+
+def writeJson(out, rows, settings):
+    json.dump(dict(settings, pairs=rows), out, indent=2)
+    out.write('\n')
+
+
+def writeTsv(out, rows, settings):
+    columns = list(rows[0].keys()) if rows else ['i', 'j', 'label_i', 'label_j', 'align_cost']
+    out.write('\t'.join(columns) + '\n')
+    for row in rows:
+        out.write('\t'.join(tsvValue(c, row[c]) for c in columns) + '\n')
+
+
+def tsvValue(column, value):
+    if value is None:
+        return 'inf' if column == 'align_cost' else ''
+    return str(value)
+
+
+'''
+    The default mode, align() over every pair of the file
+'''
+
+
+def allPairRows(args):
+    stats = AlignmentStats(trace=args.trace is not None) if args.stats or args.trace else None
+    loadStart = time.perf_counter()
+    seqs = loadSequencesFromFile(args.file, args.align_length)
+    if stats is not None:
+        stats.span('load', loadStart, time.perf_counter(), file=args.file)
+    sequences = [seqs[i][2] for i in sorted(seqs.keys())]
+    total = len(sequences) * (len(sequences) + 1) // 2
+    done = [0]
+
+    def progress(i, j, score):
+        done[0] += 1
+        if not args.quiet:
+            sys.stderr.write('\r{}/{} pairs'.format(done[0], total))
+            sys.stderr.flush()
+
+    cache = AlignmentCache(args.cache, args.cache_size) if args.cache else None
+    checkpoints = CheckpointStore(filename=args.checkpoints) if args.checkpoints else None
+    start = time.time()
+    results = GeneSequencing().align(sequences, None, args.banded, args.align_length,
+                                     engine=args.engine, strategy=args.strategy,
+                                     scoreOnly=args.score_only, workers=args.workers,
+                                     progress=progress, cache=cache, threshold=args.threshold,
+                                     checkpoints=checkpoints, scoring=args.scoring,
+                                     stats=stats)
+    seconds = time.time() - start
+    if not args.quiet:
+        sys.stderr.write('\rAligned {} pairs in {:.3f} seconds\n'.format(total, seconds))
+        if args.threshold is not None:
+            skipped = sum(1 for row in results for result in row if result.get('bound_only'))
+            sys.stderr.write('prefilter: {} of {} alignments avoided\n'.format(
+                skipped, total - len(sequences)))
+    if cache is not None:
+        if not args.quiet:
+            sys.stderr.write(cache.summary() + '\n')
+        cache.close()
+    if checkpoints is not None:
+        if not args.quiet:
+            sys.stderr.write(checkpoints.summary() + '\n')
+        checkpoints.close()
+    if stats is not None:
+        if args.stats:
+            sys.stderr.write(stats.summary() + '\n')
+        if args.trace:
+            stats.writeChromeTrace(args.trace)
+
+    settings = {'file': args.file, 'align_length': args.align_length,
+                'strategy': args.strategy or ('banded' if args.banded else 'unrestricted'),
+                'engine': args.engine, 'threshold': args.threshold, 'seconds': seconds}
+    if args.scoring is not None:
+        settings['scoring'] = repr(args.scoring)
+    return resultRows(seqs, results, args.score_only, args.strategy, args.threshold), settings
+
+
+'''
+    --query mode: each sequence of the query file is aligned only against the topK
+    sequences of the collection its sketch is closest to, one row per (query, match)
+'''
+
+
+def queryRows(args):
+    collection = loadSequencesFromFile(args.file, args.align_length)
+    sequences = [collection[i][2] for i in sorted(collection.keys())]
+    queries = loadSequencesFromFile(args.query)
+    start = time.time()
+    index = loadSketchIndex(args.file)
+    indexSeconds = time.time() - start
+    solver = GeneSequencing()
+    rows = []
+    start = time.time()
+    for q in sorted(queries.keys()):
+        _, label, query = queries[q]
+        matches = index.query(query, args.top_k)
+        results = solver.alignQuery(query, sequences, [j for j, _ in matches], args.align_length,
+                                    args.banded, engine=args.engine, strategy=args.strategy,
+                                    scoreOnly=args.score_only, threshold=args.threshold,
+                                    scoring=args.scoring)
+        for j, similarity in matches:
+            result = results[j]
+            score = result['align_cost']
+            row = {'query': q + 1, 'j': j + 1, 'label_query': label,
+                   'label_j': collection[j][1], 'similarity': round(similarity, 4),
+                   'align_cost': int(score) if score != math.inf else None}
+            if not args.score_only:
+                boundOnly = result.get('bound_only', False)
+                row['seqi_first100'] = None if boundOnly else result['seqi_first100']
+                row['seqj_first100'] = None if boundOnly else result['seqj_first100']
+            rows.append(row)
+    seconds = time.time() - start
+    if not args.quiet:
+        sys.stderr.write('{} queries against {} sequences: index {:.3f} seconds, '
+                         'aligning {} pairs {:.3f} seconds\n'.format(
+                             len(queries), len(sequences), indexSeconds, len(rows), seconds))
+    settings = {'file': args.file, 'query': args.query, 'top_k': args.top_k,
+                'align_length': args.align_length,
+                'strategy': args.strategy or ('banded' if args.banded else 'unrestricted'),
+                'engine': args.engine, 'threshold': args.threshold, 'seconds': seconds}
+    if args.scoring is not None:
+        settings['scoring'] = repr(args.scoring)
+    return rows, settings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Align every pair of sequences in a file (or new sequences against '
+                    'their closest ones with --query) without the GUI')
+    parser.add_argument('file', nargs='?', default='genomes.txt',
+                        help='sequence file in the genomes.txt format')
+    parser.add_argument('--align-length', type=int, default=1000,
+                        help='number of bases of each sequence to align')
+    parser.add_argument('--banded', action='store_true')
+    parser.add_argument('--strategy', choices=STRATEGIES,
+                        help='overrides --banded')
+    parser.add_argument('--engine', choices=ENGINES, default='python')
+    parser.add_argument('--score-only', action='store_true',
+                        help='only compute the costs, no alignment strings')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes to align pairs on')
+    parser.add_argument('--threshold', type=int,
+                        help='skip the alignment of pairs whose edit distance shows they '
+                             'must cost more than this and report only the bound')
+    parser.add_argument('--gap-open', type=int,
+                        help='cost of the first base of a gap, switches to affine gap costs')
+    parser.add_argument('--gap-extend', type=int,
+                        help='cost of every further base of a gap (default {})'.format(INDEL))
+    parser.add_argument('--query', metavar='FILE',
+                        help='align the sequences of FILE against their --top-k closest '
+                             'sequences of file (by MinHash sketch) instead of all pairs')
+    parser.add_argument('--top-k', type=int, default=10,
+                        help='number of candidates to align each query against')
+    parser.add_argument('--cache', metavar='FILE',
+                        help='SQLite file to reuse pair results from across runs')
+    parser.add_argument('--cache-size', type=int, default=100000,
+                        help='most results to keep in the cache')
+    parser.add_argument('--checkpoints', metavar='FILE',
+                        help='SQLite file of DP frontiers, a later run at a longer '
+                             '--align-length only fills in the new cells')
+    parser.add_argument('--stats', action='store_true',
+                        help='report where the time went (per phase, cells per second, '
+                             'memory) on stderr')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write a Chrome trace (chrome://tracing, Perfetto) of the run '
+                             'to FILE')
+    parser.add_argument('--format', choices=('json', 'tsv'),
+                        help='output format, by default from the output file extension')
+    parser.add_argument('-o', '--output', help='output file, stdout if not given')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="don't report progress on stderr")
+    args = parser.parse_args(argv)
+    args.scoring = None
+    if args.gap_open is not None or args.gap_extend is not None:
+        gapExtend = args.gap_extend if args.gap_extend is not None else INDEL
+        gapOpen = args.gap_open if args.gap_open is not None else gapExtend
+        try:
+            args.scoring = Scoring(gapOpen=gapOpen, gapExtend=gapExtend)
+        except ValueError as error:
+            parser.error(str(error))
+        if args.threshold is not None:
+            # the edit distance prefilter only bounds the linear costs
+            parser.error('--threshold only works without --gap-open and --gap-extend')
+        if args.strategy not in (None, 'unrestricted', 'banded'):
+            parser.error('--gap-open and --gap-extend only work with the unrestricted and '
+                         'banded strategies')
+    outputFormat = args.format
+    if outputFormat is None:
+        outputFormat = 'tsv' if args.output and args.output.endswith('.tsv') else 'json'
+    write = writeTsv if outputFormat == 'tsv' else writeJson
+    if args.query:
+        rows, settings = queryRows(args)
+    else:
+        rows, settings = allPairRows(args)
+    if args.output:
+        with open(args.output, 'w') as out:
+            write(out, rows, settings)
+    else:
+        write(sys.stdout, rows, settings)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@
 import math
 import random
 import signal
+import sqlite3
 import sys
 import time
 
@@ -18,51 +19,236 @@ from PyQt5.QtCore import *
 
 # Import in the code with the actual implementation
 from GeneSequencing import *
-
-
+from AlignmentCache import AlignmentCache
+from CheckpointStore import CheckpointStore
+from SequenceFile import SequenceIndex
+
+
+# Most sequences whose rows and columns are shown without scrolling
+VISIBLE_SEQUENCES = 10
+
+# Seconds between the batches of results the worker sends to the table
+UPDATE_SECONDS = 0.05
+
+
+# The results table as a model over an n x n matrix of costs (NaN for pairs not done
+# yet), so the view only asks for the cells it is drawing and a batch of results is
+# one dataChanged over the rows and columns it touched, however many sequences there are.
+class ScoreTableModel( QAbstractTableModel ):
+
+    def __init__( self, count, parent=None ):
+        super(ScoreTableModel,self).__init__(parent)
+        self.count = count
+        self.scores = self.emptyScores()
+
+    def emptyScores( self ):
+        if np is not None:
+            return np.full((self.count, self.count), np.nan, dtype=np.float32)
+        return [[math.nan] * self.count for _ in range(self.count)]
+
+    def rowCount( self, parent=QModelIndex() ):
+        return 0 if parent.isValid() else self.count
+
+    def columnCount( self, parent=QModelIndex() ):
+        return 0 if parent.isValid() else self.count
+
+    def data( self, index, role=Qt.DisplayRole ):
+        i, j = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            score = self.scores[i][j]
+            if j < i or math.isnan(score):
+                return ' '
+            return '{}'.format(int(score) if score != math.inf else math.inf)
+        if role == Qt.BackgroundRole and j < i:
+            return QColor(200,200,200)
+        return None
+
+    def flags( self, index ):
+        if index.column() < index.row():
+            return Qt.ItemIsSelectable
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def headerData( self, section, orientation, role=Qt.DisplayRole ):
+        if role == Qt.DisplayRole:
+            return 'sequence{}'.format(section+1)
+        return None
+
+    def setScores( self, pairs ):
+        # pairs is a list of (i, j, cost), redrawn as one range
+        if not pairs:
+            return
+        for i, j, score in pairs:
+            self.scores[i][j] = score
+        rows = [i for i, _, _ in pairs]
+        columns = [j for _, j, _ in pairs]
+        self.dataChanged.emit(self.index(min(rows), min(columns)),
+                              self.index(max(rows), max(columns)), [Qt.DisplayRole])
+
+    def clear( self ):
+        self.beginResetModel()
+        self.scores = self.emptyScores()
+        self.endResetModel()
+
+
+# Runs GeneSequencing.align() off the event loop. Lives on its own QThread and reports
+# back with signals, so the window keeps drawing and the time it measures is only the
+# alignment, not the table updates. Finished pairs are sent in batches every
+# UPDATE_SECONDS instead of one signal each.
+class AlignmentWorker( QObject ):
+    pairsDone = pyqtSignal(object)                  # [(i, j, cost)]
+    progressChanged = pyqtSignal(int, float)        # percent done, seconds so far
+    finished = pyqtSignal(object, float, bool)      # results, seconds, cancelled
+    failed = pyqtSignal(str)                        # the error align() raised
+
+    def __init__( self, solver, sequences, kwargs ):
+        super(AlignmentWorker,self).__init__()
+        self.solver = solver
+        self.sequences = sequences
+        self.kwargs = kwargs
+        self.cancelRequested = False
+
+    def cancel( self ):
+        # read by align() between pairs on the worker thread
+        self.cancelRequested = True
+
+    def run( self ):
+        n = len(self.sequences)
+        total = n * (n + 1) // 2
+        done = [0]
+        pending = []
+        start = time.time()
+        lastUpdate = [start]
+
+        def flush(now):
+            self.pairsDone.emit(list(pending))
+            del pending[:]
+            self.progressChanged.emit(100 * done[0] // total if total else 100, now - start)
+            lastUpdate[0] = now
+
+        def progress(i, j, score):
+            done[0] += 1
+            pending.append((i, j, score))
+            now = time.time()
+            if now - lastUpdate[0] >= UPDATE_SECONDS:
+                flush(now)
+
+        try:
+            results = self.solver.align( self.sequences, None, progress=progress,
+                                         cancelled=lambda: self.cancelRequested, **self.kwargs )
+        except Exception as error:
+            # raised out of a slot on this thread it would abort the whole application
+            flush(time.time())
+            self.failed.emit('{}: {}'.format(type(error).__name__, error))
+            return
+        seconds = time.time() - start
+        flush(time.time())
+        self.finished.emit(results, seconds, self.cancelRequested)
 
 
 class Proj4GUI( QMainWindow ):
 
-    def __init__( self ):
+    def __init__( self, filename='genomes.txt' ):
         super(Proj4GUI,self).__init__()
 
         self.RED_STYLE   = "background-color: rgb(255, 220, 220)"
         self.PLAIN_STYLE = "background-color: rgb(255, 255, 255)"
 
-        self.seqs = self.loadSequencesFromFile()
+        self.seqs = self.loadSequencesFromFile(filename)
         self.processed_results = None
+        self.workerThread = None
+        self.worker = None
 
         self.initUI()
         self.solver = GeneSequencing()
+        self.cache = self.openCache()
+        # lets Process at a longer Align Length carry on from the last run
+        self.checkpoints = CheckpointStore()
+        # pointers of the pairs, the alignment strings are only built for the cell clicked
+        self.tracebacks = TracebackStore()
 
 
     def processClicked(self):
-        sequences = [ self.seqs[i][2] for i in sorted(self.seqs.keys()) ]
+        align_length = int(self.alignLength.text())
+        # only the first align_length bases of each sequence are ever used
+        sequences = [ self.seqs.sequence(i, align_length) for i in range(len(self.seqs)) ]
 
         #TODO: validate alignLength
         self.statusBar.showMessage('Processing...')
-        app.processEvents()
-        start = time.time()
-        self.processed_results = self.solver.align( sequences,
-                                                    self.table,
-                                                    banded=self.banded.isChecked(),
-                                                    align_length=int(self.alignLength.text()) )
-        end = time.time()
-        ns = (end-start)
+        self.processButton.setEnabled(False)
+        self.clearButton.setEnabled(False)
+        self.cancelButton.setEnabled(True)
+        self.cacheCounts = (self.cache.hits, self.cache.misses)
+        self.tracebacks.clear()
+
+        if self.workerThread is not None:
+            # the last run's thread may still be winding down after quit()
+            self.workerThread.wait()
+        self.workerThread = QThread()
+        self.worker = AlignmentWorker( self.solver, sequences,
+                                       { 'banded': self.banded.isChecked(),
+                                         'align_length': align_length,
+                                         'scoreOnly': self.scoreOnly.isChecked(),
+                                         'cache': self.cache,
+                                         'checkpoints': self.checkpoints,
+                                         'tracebacks': self.tracebacks } )
+        self.worker.moveToThread(self.workerThread)
+        self.workerThread.started.connect(self.worker.run)
+        self.worker.pairsDone.connect(self.pairsDone)
+        self.worker.progressChanged.connect(self.progressChanged)
+        self.worker.finished.connect(self.alignmentFinished)
+        # direct, a queued quit() would wait on the event loop closeEvent() blocks in wait()
+        self.worker.finished.connect(self.workerThread.quit, Qt.DirectConnection)
+        self.worker.failed.connect(self.alignmentFailed)
+        self.worker.failed.connect(self.workerThread.quit, Qt.DirectConnection)
+        self.workerThread.start()
+
+    def cancelClicked(self):
+        self.cancelButton.setEnabled(False)
+        self.statusBar.showMessage('Cancelling...')
+        self.worker.cancel()
+
+    def pairsDone(self, pairs):
+        self.model.setScores(pairs)
+
+    def progressChanged(self, percent, seconds):
+        if self.cancelButton.isEnabled():
+            self.statusBar.showMessage('Processing... {}%  ({:3.1f} seconds)'.format(percent, seconds))
+
+    def alignmentFinished(self, results, seconds, cancelled):
+        self.processed_results = results
+        ns = seconds
         nm = math.floor(ns/60.)
         ns = ns - 60.*nm
+        hits = self.cache.hits - self.cacheCounts[0]
+        misses = self.cache.misses - self.cacheCounts[1]
+        cached = '  Cached pairs: {} of {}.'.format(hits, hits + misses)
+        done = 'Cancelled.' if cancelled else 'Done.'
         if nm > 0:
-            self.statusBar.showMessage('Done.  Time taken: {} mins and {:3.3f} seconds.'.format(nm,ns))
+            self.statusBar.showMessage(done + '  Time taken: {} mins and {:3.3f} seconds.'.format(nm,ns) + cached)
         else:
-            self.statusBar.showMessage('Done.  Time taken: {:3.3f} seconds.'.format(ns))
+            self.statusBar.showMessage(done + '  Time taken: {:3.3f} seconds.'.format(ns) + cached)
 
-        self.processButton.setEnabled(False)
+        self.cancelButton.setEnabled(False)
         self.clearButton.setEnabled(True)
-        self.repaint()
+
+    def alignmentFailed(self, message):
+        self.processed_results = None
+        self.statusBar.showMessage('Failed.  ' + message)
+        self.cancelButton.setEnabled(False)
+        # the pairs done before the error stay in the table until Clear
+        self.clearButton.setEnabled(True)
+
+    def closeEvent(self, event):
+        # let a running alignment stop at the next pair before the window goes away
+        if self.workerThread is not None and self.workerThread.isRunning():
+            self.worker.cancel()
+            self.workerThread.quit()
+            self.workerThread.wait()
+        super(Proj4GUI,self).closeEvent(event)
 
     def clearClicked(self):
         self.processed_results = None
+        self.tracebacks.clear()
         self.resetTable()
         self.processButton.setEnabled(True)
         self.clearButton.setEnabled(False)
@@ -80,63 +266,47 @@ class Proj4GUI( QMainWindow ):
         self.repaint()
 
     def resetTable(self):
-        for i in range(self.table.rowCount()):
-            for j in range(self.table.columnCount()):
-                if j >= i:
-                    self.table.item(i,j).setText(' ')
+        self.model.clear()
 
     def cellClicked(self, i, j):
         print('CELL {},{} clicked!'.format(i,j))
-        print('LABELS: "{}" AND "{}"'.format(self.seqs[i][1],self.seqs[j][1]))
+        print('LABELS: "{}" AND "{}"'.format(self.seqs.labels[i],self.seqs.labels[j]))
 
-        if self.processed_results and j >= i:
+        # a cancelled run leaves the pairs it never got to empty
+        if self.processed_results and j >= i and self.processed_results[i][j]:
             self.seq1n_lbl.setText( 'Label {}: '.format(i+1) )
             self.seq1c_lbl.setText( 'Sequence {}: '.format(i+1) )
             self.seq2c_lbl.setText( 'Sequence {}: '.format(j+1) )
             self.seq2n_lbl.setText( 'Label {}: '.format(j+1) )
 
-            self.seq1_name.setText( '{}'.format(self.seqs[i][1]) )
-            self.seq2_name.setText( '{}'.format(self.seqs[j][1]) )
+            self.seq1_name.setText( '{}'.format(self.seqs.labels[i]) )
+            self.seq2_name.setText( '{}'.format(self.seqs.labels[j]) )
             results = self.processed_results[i][j]
             self.seq1_chars.setText( '{}'.format(results['seqi_first100']) )
             self.seq2_chars.setText( '{}'.format(results['seqj_first100']) )
 
-    def loadSequencesFromFile( self ):
-        FILENAME = 'genomes.txt'
-        raw = open(FILENAME,'r').readlines()
-        sequences = {}
-        
-        i = 0
-        cur_id  = ''
-        cur_str = ''
-        for liner in raw:
-            line = liner.strip()
-            if '#' in line:
-                if len(cur_id) > 0:
-                    if '|' in cur_id:
-                        cur_id = cur_id.split('|')[-1]
-                    sequences[i] = (i,cur_id,cur_str)
-                    cur_id  = ''
-                    cur_str = ''
-                    i += 1
-                parts = line.split('#')
-                cur_id = parts[0]
-                cur_str += parts[1]
-            else:
-                cur_str += line
-        if len(cur_str) > 0 or len(cur_id) > 0:
-            if '|' in cur_id:
-                cur_id = cur_id.split('|')[-1]
-            sequences[i] = (i,cur_id,cur_str)
-        return sequences
+    def loadSequencesFromFile( self, filename ):
+        return SequenceIndex(filename)
+
+    def openCache( self ):
+        try:
+            return AlignmentCache()
+        except (sqlite3.OperationalError, OSError):
+            # a read only directory, the results are only kept until the window closes
+            return AlignmentCache(':memory:')
 
     def getTableDims( self ):
-        w = self.table.columnWidth(self.table.rowCount()-1) - 4
-        for i in range(self.table.columnCount()):
+        # the first VISIBLE_SEQUENCES rows and columns, the rest scroll
+        shown = min(self.model.rowCount(), VISIBLE_SEQUENCES)
+        w = self.table.verticalHeader().width() + 2
+        for i in range(shown):
             w += self.table.columnWidth(i)
-        h = self.table.horizontalHeader().height() + 1
-        for i in range(self.table.rowCount()):
+        h = self.table.horizontalHeader().height() + 2
+        for i in range(shown):
             h += self.table.rowHeight(i)
+        if self.model.rowCount() > shown:
+            w += self.table.verticalScrollBar().sizeHint().width()
+            h += self.table.horizontalScrollBar().sizeHint().height()
         return (w,h)
 
     def initUI( self ):
@@ -151,30 +321,15 @@ class Proj4GUI( QMainWindow ):
         boxwidget.setLayout(vbox)
         self.setCentralWidget( boxwidget )
 
-        self.table = QTableWidget(self)
-        NSEQ = 10
-        self.table.setRowCount(NSEQ)
-        self.table.setColumnCount(NSEQ)
-
-        headers = [ 'sequence{}'.format(a+1) for a in range(NSEQ) ]
-        self.table.setHorizontalHeaderLabels(headers)
-        self.table.setVerticalHeaderLabels(headers)
-        self.table.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.table.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-
-        for i in range(NSEQ):
-            for j in range(NSEQ):
-                qitem = QTableWidgetItem(" ")
-                #qitem.setEnabled(False)
-                qitem.setFlags( Qt.ItemIsSelectable |  Qt.ItemIsEnabled )
-                if j < i:
-                    qitem.setBackground(QColor(200,200,200))
-                    qitem.setFlags( Qt.ItemIsSelectable )
-                self.table.setItem(i,j,qitem)
-        for i in range(NSEQ):
-            self.table.resizeColumnToContents(i)
-        for j in range(NSEQ):
-            self.table.resizeRowToContents(i)
+        self.model = ScoreTableModel(len(self.seqs), self)
+        self.table = QTableView(self)
+        self.table.setModel(self.model)
+        # every column as wide as the header, so sizing never has to look at the cells
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        header = self.table.horizontalHeader()
+        header.setDefaultSectionSize(
+            header.fontMetrics().width('sequence{}'.format(self.model.columnCount())) + 12)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
 
         w,h = self.getTableDims()
         self.table.setFixedWidth(w)
@@ -182,9 +337,12 @@ class Proj4GUI( QMainWindow ):
 
         self.processButton  = QPushButton('Process')
         self.clearButton    = QPushButton('Clear')
+        self.cancelButton   = QPushButton('Cancel')
 
         self.banded     = QCheckBox('Banded')
         self.banded.setChecked(False)
+        self.scoreOnly  = QCheckBox('Score Only')
+        self.scoreOnly.setChecked(False)
         self.alignLength      = QLineEdit('1000')
         self.seq1_name     = QLineEdit('')
         self.seq1_name.setFixedWidth(500)
@@ -231,6 +389,7 @@ class Proj4GUI( QMainWindow ):
         h = QHBoxLayout()
         h.addStretch(1)
         h.addWidget( self.processButton )
+        h.addWidget( self.cancelButton )
         h.addWidget( self.clearButton )
         h.addStretch(1)
         vbox.addLayout(h)
@@ -238,6 +397,7 @@ class Proj4GUI( QMainWindow ):
         h = QHBoxLayout()
         h.addStretch(1)
         h.addWidget( self.banded )
+        h.addWidget( self.scoreOnly )
         h.addWidget( QLabel('Align Length: ') )
         h.addWidget( self.alignLength )
         h.addStretch(1)
@@ -246,7 +406,9 @@ class Proj4GUI( QMainWindow ):
         self.processButton.clicked.connect(self.processClicked)
         self.clearButton.clicked.connect(self.clearClicked)
         self.clearButton.setEnabled(False)
-        self.table.cellClicked.connect(self.cellClicked)
+        self.cancelButton.clicked.connect(self.cancelClicked)
+        self.cancelButton.setEnabled(False)
+        self.table.clicked.connect(lambda index: self.cellClicked(index.row(), index.column()))
 
         self.show()
 
@@ -256,5 +418,6 @@ if __name__ == '__main__':
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     
     app = QApplication(sys.argv)
-    w = Proj4GUI()
+    # another sequence file can be given, genomes.txt by default
+    w = Proj4GUI(*sys.argv[1:2])
     sys.exit(app.exec())
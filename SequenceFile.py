@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+
+# Reading the sequence files used by Proj4GUI.py and GeneSequencingCLI.py.
+# Kept free of Qt so it can be used without a display.
+
+import mmap
+import os
+
+# Extension of the offset index written next to a sequence file
+INDEX_EXTENSION = '.idx'
+
+# Bytes that can sit between the bases of a sequence
+WHITESPACE = b' \t\r\n'
+
+
+'''
+    Offset index over a file of sequences where each sequence starts with a line
+    "label#bases" and carries on over the following lines (the genomes.txt format).
+    The first time a file is opened its label, number of bases and byte range are
+    written to filename.idx (one line per sequence, like a .fai file). Later opens
+    only read that index, as long as the file's size and modification time match.
+    The data file is memory mapped and sequence() copies only the bytes of the
+    prefix asked for, so opening stays cheap however big the file gets.
+'''
+
+
+class SequenceIndex:
+
+    def __init__(self, filename, indexFilename=None):
+        self.filename = filename
+        self.indexFilename = indexFilename or filename + INDEX_EXTENSION
+        stat = os.stat(filename)
+        self.stamp = '{}\t{}'.format(stat.st_size, stat.st_mtime_ns)
+        self.labels = []
+        self.lengths = []
+        self.starts = []
+        self.ends = []
+        if not self.readIndex():
+            self.buildIndex()
+            self.writeIndex()
+        self.file = open(filename, 'rb')
+        # mmap can't map an empty file, and there's nothing to read from one anyway
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if stat.st_size > 0 else b''
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    '''
+        Loads the index file if there is one and it was built from this version of
+        the data file. Returns False when the index has to be rebuilt.
+    '''
+
+    def readIndex(self):
+        try:
+            with open(self.indexFilename, 'r') as index:
+                if index.readline().rstrip('\n') != self.stamp:
+                    return False
+                for line in index:
+                    label, length, start, end = line.rstrip('\n').rsplit('\t', 3)
+                    self.labels.append(label)
+                    self.lengths.append(int(length))
+                    self.starts.append(int(start))
+                    self.ends.append(int(end))
+        except (OSError, ValueError):
+            self.labels, self.lengths, self.starts, self.ends = [], [], [], []
+            return False
+        return True
+
+    '''
+        One streaming pass over the data file recording where every sequence's bases
+        start and end and how many there are
+        Time:
+            O(f) where f is the size of the file
+        Space:
+            O(s) where s is the number of sequences
+    '''
+
+    def buildIndex(self):
+        offset = 0
+        with open(self.filename, 'rb') as data:
+            for line in data:
+                if b'#' in line:
+                    if self.labels:
+                        self.ends.append(offset)
+                    split = line.index(b'#')
+                    label = line[:split].strip().decode('latin-1')
+                    if '|' in label:
+                        label = label.split('|')[-1]
+                    self.labels.append(label)
+                    self.starts.append(offset + split + 1)
+                    self.lengths.append(len(line[split + 1:].translate(None, WHITESPACE)))
+                elif self.labels:
+                    self.lengths[-1] += len(line.translate(None, WHITESPACE))
+                offset += len(line)
+        if self.labels:
+            self.ends.append(offset)
+
+    '''
+        Saves the index next to the data file. A read only directory just means the
+        index is rebuilt next time.
+    '''
+
+    def writeIndex(self):
+        try:
+            with open(self.indexFilename, 'w') as index:
+                index.write(self.stamp + '\n')
+                for row in zip(self.labels, self.lengths, self.starts, self.ends):
+                    index.write('\t'.join(str(value) for value in row) + '\n')
+        except OSError:
+            pass
+
+    '''
+        Returns the first length bases of sequence i (all of them if length is None).
+        Reads from the memory map a little past the prefix to allow for line breaks
+        and only goes back for more if the lines were shorter than expected.
+        Time:
+            O(l) where l is the length of the prefix
+        Space:
+            O(l)
+    '''
+
+    def sequence(self, i, length=None):
+        wanted = self.lengths[i] if length is None else min(length, self.lengths[i])
+        chunks = []
+        found = 0
+        position = self.starts[i]
+        while found < wanted and position < self.ends[i]:
+            missing = wanted - found
+            stop = min(self.ends[i], position + missing + missing // 32 + 64)
+            chunk = self.data[position:stop].translate(None, WHITESPACE)
+            chunks.append(chunk)
+            found += len(chunk)
+            position = stop
+        return b''.join(chunks)[:wanted].decode('latin-1')
+
+
+'''
+    Returns a dict of index -> (index, label, sequence) for every sequence in the file,
+    cut to the first length bases when length is given. Labels with '|' are cut down
+    to the part after the last '|'.
+'''
+
+
+def loadSequencesFromFile(filename, length=None):
+    with SequenceIndex(filename) as index:
+        return {i: (i, index.labels[i], index.sequence(i, length)) for i in range(len(index))}
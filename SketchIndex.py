@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+
+# MinHash sketches of a sequence collection, used to pick which stored sequences are
+# worth aligning a new one against instead of aligning it against all of them.
+#
+#   index = SketchIndex.fromSequences(sequences, labels)
+#   index.save('genomes.txt.sketch')
+#   for i, similarity in index.query(newGenome, topK=10): ...
+
+import os
+
+from SequenceFile import SequenceIndex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Length of the k-mers hashed into a sketch, 21 is what Mash uses for genomes
+KMER = 21
+
+# Number of smallest k-mer hashes kept per sequence
+SKETCH_SIZE = 256
+
+# Extension of the sketch file written next to a sequence file
+SKETCH_EXTENSION = '.sketch'
+
+MASK64 = (1 << 64) - 1
+
+# 2 bit code of each base, anything else breaks the k-mers it is in
+BASES = {'a': 0, 'c': 1, 'g': 2, 't': 3, 'A': 0, 'C': 1, 'G': 2, 'T': 3}
+
+
+'''
+    splitmix64 finalizer, spreads the 2 bit packed k-mers over all 64 bits so the
+    smallest hashes are a uniform sample of the k-mers
+'''
+
+
+def mixHash(x):
+    x = ((x ^ (x >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94d049bb133111eb) & MASK64
+    return x ^ (x >> 31)
+
+
+'''
+    The size smallest distinct hashes of the canonical k-mers of seq (the smaller of the
+    k-mer and its reverse complement, so a genome and its reverse strand have the same
+    sketch), sorted. k-mers with anything other than acgt in them are skipped. numpy is
+    used when it is installed, both paths give the same sketch.
+    Time:
+        O(nk) with numpy, O(n log n) without, n is the length of seq
+    Space:
+        O(n)
+'''
+
+
+def bottomSketch(seq, k, size):
+    if np is not None:
+        return bottomSketchNumpy(seq, k, size)
+    hashes = set()
+    forward = reverse = valid = 0
+    top = 2 * (k - 1)
+    kmerMask = (1 << 2 * k) - 1
+    for base in seq:
+        code = BASES.get(base)
+        if code is None:
+            valid = 0
+            continue
+        forward = ((forward << 2) | code) & kmerMask
+        reverse = (reverse >> 2) | ((3 - code) << top)
+        valid += 1
+        if valid >= k:
+            hashes.add(mixHash(min(forward, reverse)))
+    return sorted(hashes)[:size]
+
+
+def bottomSketchNumpy(seq, k, size):
+    lookup = np.full(256, 4, dtype=np.uint8)
+    for base, code in BASES.items():
+        lookup[ord(base)] = code
+    codes = lookup[np.frombuffer(seq.encode('latin-1'), dtype=np.uint8)]
+    count = len(codes) - k + 1
+    if count <= 0:
+        return []
+    invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+    valid = invalid[k:] - invalid[:count] == 0
+    codes = codes.astype(np.uint64) & np.uint64(3)
+    forward = np.zeros(count, dtype=np.uint64)
+    reverse = np.zeros(count, dtype=np.uint64)
+    for i in range(k):
+        forward |= codes[i:i + count] << np.uint64(2 * (k - 1 - i))
+        reverse |= (np.uint64(3) - codes[i:i + count]) << np.uint64(2 * i)
+    x = np.minimum(forward, reverse)[valid]
+    # uint64 multiplication wraps, which is the & MASK64 of mixHash
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    x = x ^ (x >> np.uint64(31))
+    if len(x) > 4 * size:
+        # only the smallest few matter, no need to sort all of them unless repeats
+        # leave fewer than size distinct ones among them
+        smallest = np.unique(np.partition(x, 4 * size)[:4 * size + 1])
+        if len(smallest) >= size:
+            return smallest[:size].tolist()
+    return np.unique(x)[:size].tolist()
+
+
+'''
+    Bottom-s MinHash index. Each sequence is reduced to the sketchSize smallest hashes
+    of its k-mers. The share of a query's sketch found in a stored sketch estimates how
+    many k-mers the two have in common, so the stored sequences sharing the most hashes
+    are the ones closest to the query. An inverted index from hash to the sequences
+    holding it means a query only touches sequences it shares something with.
+    The sketch file is a header line "k<TAB>sketchSize<TAB>stamp" and then one line per
+    sequence "label<TAB>length<TAB>hashes" with the hashes in hex. k can be at most 32
+    so a packed k-mer fits in 64 bits.
+'''
+
+
+class SketchIndex:
+
+    def __init__(self, k=KMER, sketchSize=SKETCH_SIZE):
+        if not 1 <= k <= 32:
+            raise ValueError("k must be between 1 and 32, got {}".format(k))
+        self.k = k
+        self.sketchSize = sketchSize
+        self.labels = []
+        self.lengths = []
+        self.sketches = []
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def fromSequences(cls, sequences, labels=None, k=KMER, sketchSize=SKETCH_SIZE):
+        index = cls(k, sketchSize)
+        for i, seq in enumerate(sequences):
+            index.add(labels[i] if labels is not None else str(i), seq)
+        return index
+
+    '''
+        The sketchSize smallest k-mer hashes of seq, sorted
+        Time:
+            O(n log s) n is the length of seq, s the sketch size
+        Space:
+            O(n)
+    '''
+
+    def sketch(self, seq):
+        return bottomSketch(seq, self.k, self.sketchSize)
+
+    def add(self, label, seq):
+        return self.addSketch(label, len(seq), self.sketch(seq))
+
+    def addSketch(self, label, length, sketch):
+        i = len(self.labels)
+        self.labels.append(label)
+        self.lengths.append(length)
+        self.sketches.append(sketch)
+        for value in sketch:
+            self.postings.setdefault(value, []).append(i)
+        return i
+
+    '''
+        Returns up to topK (index, similarity) pairs of the stored sequences most like
+        seq, best first. similarity is the fraction of the query's sketch hashes the
+        stored sketch also has (0 to 1). Sequences that share no hash aren't returned.
+        Time:
+            O(n log s + p) where p is the number of postings of the query's hashes
+        Space:
+            O(s + c) where c is the number of sequences sharing a hash with the query
+    '''
+
+    def query(self, seq, topK=10):
+        return self.querySketch(self.sketch(seq), topK)
+
+    def querySketch(self, sketch, topK=10):
+        shared = {}
+        for value in sketch:
+            for i in self.postings.get(value, ()):
+                shared[i] = shared.get(i, 0) + 1
+        size = max(len(sketch), 1)
+        best = sorted(shared.items(), key=lambda item: (-item[1], item[0]))[:topK]
+        return [(i, count / size) for i, count in best]
+
+    def save(self, filename, stamp=''):
+        with open(filename, 'w') as out:
+            out.write('{}\t{}\t{}\n'.format(self.k, self.sketchSize, stamp))
+            for label, length, sketch in zip(self.labels, self.lengths, self.sketches):
+                out.write('{}\t{}\t{}\n'.format(
+                    label, length, ' '.join('{:x}'.format(value) for value in sketch)))
+
+    '''
+        Reads a file written by save. With a stamp the file is only used if it was saved
+        with the same one, otherwise None is returned, as it is for a missing or broken file.
+    '''
+
+    @classmethod
+    def load(cls, filename, stamp=None):
+        try:
+            with open(filename, 'r') as data:
+                k, sketchSize, savedStamp = data.readline().rstrip('\n').split('\t', 2)
+                if stamp is not None and savedStamp != stamp:
+                    return None
+                index = cls(int(k), int(sketchSize))
+                for line in data:
+                    label, length, hashes = line.rstrip('\n').rsplit('\t', 2)
+                    index.addSketch(label, int(length),
+                                    [int(value, 16) for value in hashes.split()])
+        except (OSError, ValueError):
+            return None
+        return index
+
+
+'''
+    The sketch index of every sequence in a sequence file, kept in filename.sketch and
+    only rebuilt when the file (or k and sketchSize) changes
+'''
+
+
+def loadSketchIndex(filename, k=KMER, sketchSize=SKETCH_SIZE):
+    stat = os.stat(filename)
+    stamp = '{}\t{}\t{}\t{}'.format(stat.st_size, stat.st_mtime_ns, k, sketchSize)
+    index = SketchIndex.load(filename + SKETCH_EXTENSION, stamp)
+    if index is not None:
+        return index
+    with SequenceIndex(filename) as sequences:
+        index = SketchIndex(k, sketchSize)
+        for i in range(len(sequences)):
+            index.add(sequences.labels[i], sequences.sequence(i))
+    try:
+        index.save(filename + SKETCH_EXTENSION, stamp)
+    except OSError:
+        pass
+    return index